@@ -1,12 +1,13 @@
 import streamlit as st
-import visuals
 from utils import show_logo
+from tracing import finish_page, start_page
 
 # Configuration de la page
 st.set_page_config(
     page_title="FP&A Reallocation Analysis Dashboard",
     layout="wide"
 )
+start_page(__file__)
 
 # Affiche le logo cliquable, centré
 show_logo(width=1200)
@@ -97,3 +98,5 @@ st.markdown(
     """,
     unsafe_allow_html=False
 )
+
+finish_page()
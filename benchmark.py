@@ -0,0 +1,233 @@
+# benchmark.py
+
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, APP_DIR)
+
+from datastore import CACHE_DIR  # noqa: E402
+
+# Tailles de table de faits mesurées (None = données de démonstration)
+SIZES = {"28k": None, "1M": 1_000_000, "10M": 10_000_000}
+# Jeux synthétiques (synthetic.py) des tailles agrandies
+BENCH_DIR = os.path.join(APP_DIR, CACHE_DIR, "bench")
+BASELINE_PATH = os.environ.get("FPNA_BENCH_BASELINE", os.path.join(APP_DIR, "benchmark_baseline.json"))
+# Hausse relative tolérée avant de signaler une régression
+TOLERANCE = float(os.environ.get("FPNA_BENCH_TOLERANCE", "0.25"))
+# Passes chronométrées par page (process neufs) : médiane comparée au baseline
+REPEAT = int(os.environ.get("FPNA_BENCH_REPEAT", "5"))
+# Métriques de temps agrégées sur les passes
+TIMINGS = ["load_s", "cold_s", "warm_s"]
+# En dessous de ces écarts absolus, une hausse relative est du bruit
+MIN_DELTA = {"s": 0.05, "mb": 5.0}
+
+# --- Jeux de données agrandis -------------------------------------------------
+
+def scaled_sources(n_rows: int, seed: int = 0):
+    """
+    Table de faits synthétique d'au moins `n_rows` lignes (Parquet) et sa
+    dimension client, générées par synthetic.py avec la forme des données de
+    démonstration (le nombre de clients s'ajuste à la taille). Renvoie
+    (fact_path, clients_path) ; réutilise les fichiers existants.
+    """
+    import synthetic
+
+    fact_path = os.path.join(BENCH_DIR, f"fact-{n_rows}-{seed}.parquet")
+    clients_path = os.path.join(BENCH_DIR, f"clients-{n_rows}-{seed}.csv")
+    if not (os.path.exists(fact_path) and os.path.exists(clients_path)):
+        synthetic.generate(synthetic.config_for_rows(n_rows, seed=seed), fact_path, clients_path)
+    return fact_path, clients_path
+
+
+# --- Mesure par étape (process worker) ----------------------------------------
+
+def run_worker(page: str, trace: bool) -> dict:
+    """
+    Dans un process neuf : charge le Dataset puis exécute `page` à froid et
+    à chaud (AppTest). Le détail par étape vient des spans de tracing.py
+    (temps propres du rerun à froid). Avec `trace`, mesure le pic
+    tracemalloc au lieu des temps.
+    """
+    os.chdir(APP_DIR)
+    if trace:
+        import tracemalloc
+        tracemalloc.start()
+    from streamlit.testing.v1 import AppTest
+    from datastore import load_dataset
+    from tracing import get_metrics
+
+    result = {}
+    t0 = time.perf_counter()
+    data = load_dataset()
+    if not trace:
+        result["rows"] = len(data.fact)
+        result["load_s"] = time.perf_counter() - t0
+    else:
+        result["load_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+
+    for run in ("cold", "warm"):
+        t0 = time.perf_counter()
+        at = AppTest.from_file(os.path.abspath(page), default_timeout=3600).run()
+        elapsed = time.perf_counter() - t0
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        if trace:
+            if run == "cold":
+                result["peak_mb"] = (tracemalloc.get_traced_memory()[1] - base) / 2**20
+            break
+        result[f"{run}_s"] = elapsed
+        if run == "cold":
+            stages = get_metrics().last[os.path.splitext(os.path.basename(page))[0]].stages()
+            stages["other"] = max(0.0, elapsed - sum(stages.values()))
+            result["stages"] = stages
+    return result
+
+
+# --- Orchestration ------------------------------------------------------------
+
+def _run(size: str, page: str, env: dict, trace: bool) -> dict:
+    cmd = [sys.executable, __file__, "--worker", page] + (["--trace"] if trace else [])
+    proc = subprocess.run(cmd, cwd=APP_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{size} {page}: {proc.stderr.strip().splitlines()[-1]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def bench_page(size: str, page: str, repeat: int = REPEAT) -> dict:
+    """
+    `repeat` passes chronométrées puis une passe mémoire, chacune dans un
+    process neuf. Les temps retenus sont les médianes des passes ; leur
+    étendue (min, max) est gardée dans "spread" et les valeurs brutes dans
+    "samples". Le pic tracemalloc, déterministe à données égales, n'est
+    mesuré qu'une fois.
+    """
+    # Spans activés dans les workers, sans export fichier ni log
+    env = dict(os.environ, FPNA_TRACE="1", FPNA_METRICS_FILE="", FPNA_TRACE_LOG=os.devnull)
+    if SIZES[size] is not None:
+        env["FPNA_FACT_PATH"], env["FPNA_CLIENT_DIM_PATH"] = scaled_sources(SIZES[size])
+    runs = [_run(size, page, env, trace=False) for _ in range(max(1, repeat))]
+    result = {"rows": runs[0]["rows"], "repeat": len(runs)}
+    for key in TIMINGS:
+        values = [r[key] for r in runs]
+        result[key] = statistics.median(values)
+        result.setdefault("spread", {})[key] = [min(values), max(values)]
+        result.setdefault("samples", {})[key] = values
+    result["stages"] = {k: statistics.median(r["stages"][k] for r in runs) for k in runs[0]["stages"]}
+    result.update(_run(size, page, env, trace=True))
+    return result
+
+
+def _flat_metrics(metrics: dict) -> dict:
+    """Métriques comparables d'une page : premier niveau plus médianes par étape ("stages.<étape>")."""
+    flat = {k: v for k, v in metrics.items()
+            if k not in ("rows", "repeat") and isinstance(v, (int, float))}
+    flat.update({f"stages.{k}": v for k, v in metrics.get("stages", {}).items()})
+    return flat
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Métriques (médianes des temps de page et de chaque étape, pics mémoire)
+    en hausse de plus de `tolerance`, et d'un écart absolu significatif, par
+    rapport au baseline.
+    """
+    regressions = []
+    for size, pages in results.items():
+        for page, metrics in pages.items():
+            old = baseline.get(size, {}).get(page)
+            if not old:
+                continue
+            old = _flat_metrics(old)
+            for key, value in _flat_metrics(metrics).items():
+                if key not in old:
+                    continue
+                unit = "mb" if key.endswith("_mb") else "s"
+                if value > old[key] * (1 + tolerance) and value - old[key] > MIN_DELTA[unit]:
+                    regressions.append((size, page, key, old[key], value))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark des pages (AppTest) à plusieurs tailles de table de faits."
+    )
+    parser.add_argument("--sizes", nargs="+", default=["28k", "1M"], choices=list(SIZES))
+    parser.add_argument("--pages", nargs="*", help="pages à mesurer (sous-chaîne du nom ; défaut : toutes)")
+    parser.add_argument("--output", help="fichier JSON des résultats")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline de comparaison")
+    parser.add_argument("--save-baseline", action="store_true", help="enregistre les résultats comme baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="hausse relative tolérée")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="passes chronométrées par page (médiane)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--trace", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.trace)))
+        return 0
+
+    pages = sorted(glob.glob("pages/*.py", root_dir=APP_DIR))
+    if args.pages:
+        pages = [p for p in pages if any(f in p for f in args.pages)]
+
+    # Cache Arrow des sources de démonstration construit avant les mesures
+    from datastore import CLIENT_DIM_PATH, FACT_PATH, read_source_cached
+    read_source_cached(FACT_PATH)
+    read_source_cached(CLIENT_DIM_PATH)
+
+    results = {}
+    for size in args.sizes:
+        results[size] = {}
+        for page in pages:
+            r = bench_page(size, page, args.repeat)
+            results[size][page] = r
+            stages = " ".join(f"{k}={v:.2f}" for k, v in r["stages"].items())
+            print(f"{size:>4} {page:36s} rows={r['rows']:>10,} load={r['load_s']:6.2f}s "
+                  f"cold={r['cold_s']:6.2f}s [{r['spread']['cold_s'][0]:.2f}-{r['spread']['cold_s'][1]:.2f}] "
+                  f"warm={r['warm_s']:6.2f}s "
+                  f"peak={r['peak_mb']:7.1f}MB  [{stages}]", flush=True)
+
+    report = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline enregistré : {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("Pas de baseline : relancer avec --save-baseline pour en créer un.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    for size, page, key, old, new in regressions:
+        print(f"RÉGRESSION {size} {page} {key}: {old:.3f} -> {new:.3f} ({new / old - 1:+.0%})")
+    if not regressions:
+        print(f"Aucune régression au-delà de {args.tolerance:.0%}.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# bitmap.py
+
+import numpy as np
+import pandas as pd
+
+# Au-delà de cette cardinalité, une dimension est indexée par positions triées
+# plutôt que par un bitset par valeur (mémoire O(lignes) au lieu de
+# O(lignes × valeurs), ex. 500+ clients).
+MAX_BITMAP_CARDINALITY = 64
+
+
+def _as_list(values):
+    if isinstance(values, (list, tuple, set, frozenset, pd.Index, np.ndarray)):
+        return list(values)
+    return [values]
+
+
+class BitmapIndex:
+    """
+    Index de filtrage construit une fois sur un DataFrame.
+
+    Chaque valeur d'une dimension de faible cardinalité a son bitset (bits
+    packés, 1 bit par ligne) ; les dimensions de forte cardinalité gardent
+    les positions des lignes triées par valeur. Une combinaison de filtres
+    devient quelques OR (valeurs d'une même dimension) puis AND (entre
+    dimensions) sur des bitsets, sans toucher au DataFrame.
+    """
+
+    def __init__(self, frame: pd.DataFrame, columns, max_bitmap_cardinality: int = MAX_BITMAP_CARDINALITY):
+        self.size = len(frame)
+        self._nbytes = (self.size + 7) // 8
+        self._values = {}      # col -> valeurs triées
+        self._complete = {}    # col -> aucune valeur manquante
+        self._bitmaps = {}     # col -> {valeur: bitset packé}
+        self._positions = {}   # col -> (positions triées par valeur, {valeur: (début, fin)})
+
+        for col in columns:
+            codes, uniques = pd.factorize(frame[col], sort=True)
+            uniques = list(uniques)
+            self._values[col] = uniques
+            self._complete[col] = bool((codes >= 0).all())
+            if len(uniques) <= max_bitmap_cardinality:
+                self._bitmaps[col] = {v: np.packbits(codes == i) for i, v in enumerate(uniques)}
+            else:
+                order = np.argsort(codes, kind="stable")
+                counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+                # les lignes sans valeur (code -1) sont triées en tête
+                bounds = int((codes < 0).sum()) + np.concatenate([[0], np.cumsum(counts)])
+                ranges = {v: (bounds[i], bounds[i + 1]) for i, v in enumerate(uniques)}
+                self._positions[col] = (order, ranges)
+
+    @property
+    def nbytes(self) -> int:
+        """Octets des bitsets et des tableaux de positions."""
+        return (sum(b.nbytes for bitmaps in self._bitmaps.values() for b in bitmaps.values())
+                + sum(order.nbytes for order, _ in self._positions.values()))
+
+    def values(self, col) -> list:
+        """Valeurs distinctes (triées, hors manquantes) d'une dimension indexée."""
+        return self._values[col]
+
+    def _column_bits(self, col, values):
+        selected = set(values)
+        # Filtre non restrictif : toutes les valeurs cochées, aucune ligne sans valeur
+        if self._complete[col] and selected.issuperset(self._values[col]):
+            return None
+
+        if col in self._bitmaps:
+            bitmaps = self._bitmaps[col]
+            bits = np.zeros(self._nbytes, dtype=np.uint8)
+            for v in selected:
+                if v in bitmaps:
+                    np.bitwise_or(bits, bitmaps[v], out=bits)
+            return bits
+
+        order, ranges = self._positions[col]
+        mask = np.zeros(self.size, dtype=bool)
+        for v in selected:
+            if v in ranges:
+                start, end = ranges[v]
+                mask[order[start:end]] = True
+        return np.packbits(mask)
+
+    def select(self, where: dict):
+        """
+        Bitset packé des lignes vérifiant tous les filtres {colonne: valeur(s)},
+        ou None si aucun filtre n'est restrictif (toutes les lignes).
+        """
+        bits = None
+        for col, values in (where or {}).items():
+            col_bits = self._column_bits(col, _as_list(values))
+            if col_bits is None:
+                continue
+            bits = col_bits if bits is None else np.bitwise_and(bits, col_bits, out=bits)
+        return bits
+
+    def mask(self, where: dict):
+        """Masque booléen (ou None = toutes les lignes) correspondant à select()."""
+        bits = self.select(where)
+        if bits is None:
+            return None
+        return np.unpackbits(bits, count=self.size).view(bool)
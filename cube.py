@@ -0,0 +1,193 @@
+# cube.py
+
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from bitmap import BitmapIndex
+from datastore import load_dataset
+from memory import tracked_cache
+from tracing import traced
+
+# Grain du cube : une cellule par combinaison non vide de ces dimensions
+DIMENSIONS = ["Year", "MonthNum", "Scenario", "Country", "Category", "Subcategory", "Client"]
+# Attributs portés par une dimension du cube (Segment dépend du Client)
+ATTRIBUTES = {"Segment": "Client"}
+# Mesures additives : toute agrégation du cube est une somme de cellules
+MEASURES = ["Revenue", "Cost", "Volume", "Rows"]
+
+
+@dataclass(frozen=True)
+class Cube:
+    """
+    Cube OLAP matérialisé des mesures additives de la table de faits.
+
+    Les graphiques sont tous des sommes de Volume, Volume×Unit Price et
+    Volume×Unit Cost le long de quelques dimensions : ils se calculent sur
+    les cellules du cube (dont la taille dépend des cardinalités des
+    dimensions) au lieu de re-balayer les lignes de faits. Les filtres
+    passent par un index bitmap et les agrégations par np.bincount sur la
+    sélection : aucune copie des cellules à chaque rerun.
+    """
+    cells: pd.DataFrame
+    index: BitmapIndex
+    version: str
+    # Codes de groupes mémorisés par tuple de dimensions `by`
+    _groupings: dict = field(default_factory=dict, repr=False, compare=False)
+
+    def values(self, dim) -> list:
+        """Valeurs distinctes triées d'une dimension (options des filtres)."""
+        return self.index.values(dim)
+
+    def mask(self, where: dict = None):
+        """Masque booléen des cellules vérifiant les filtres (None = toutes)."""
+        return self.index.mask(where)
+
+    def _grouping(self, by: tuple):
+        if by not in self._groupings:
+            if by:
+                grouped = self.cells.groupby(list(by), observed=True, sort=True)
+                codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.intp)
+                keys = grouped.size().reset_index()[list(by)]
+            else:
+                codes = np.zeros(len(self.cells), dtype=np.intp)
+                keys = pd.DataFrame(index=[0])
+            self._groupings[by] = (codes, keys)
+        return self._groupings[by]
+
+    @traced("aggregate:cube.query")
+    def query(self, by=(), where: dict = None) -> pd.DataFrame:
+        """
+        Roll-up du cube : somme des mesures par les dimensions `by`, après
+        filtrage `where` ({dimension: valeur(s)}). Ajoute la mesure dérivée
+        Margin (Revenue - Cost).
+
+        >>> cube.query(by=["Country"], where={"Scenario": "Actual", "Year": 2024})
+        """
+        codes, keys = self._grouping(tuple(by))
+        selected = codes >= 0
+        mask = self.mask(where)
+        if mask is not None:
+            selected &= mask
+        rows = np.flatnonzero(selected)
+        group_codes = codes[rows]
+
+        out = keys.copy()
+        for m in MEASURES:
+            values = self.cells[m].to_numpy()
+            sums = np.bincount(group_codes, weights=values[rows], minlength=len(keys))
+            out[m] = sums.round().astype(values.dtype) if values.dtype.kind == "i" else sums
+        out = out[out["Rows"] > 0].reset_index(drop=True)
+        out["Margin"] = out["Revenue"] - out["Cost"]
+        return out
+
+    @traced("aggregate:cube.aggregate")
+    def aggregate(self, by, measures: dict, slices: dict = None, slice_col: str = "Scenario") -> pd.DataFrame:
+        """
+        Plusieurs mesures en une seule agrégation du cube par tranche.
+
+        - by       : dimensions de regroupement
+        - measures : {colonne résultat: spécification}, avec
+                       ("sum", m)             somme de la mesure m
+                       ("share", m)           part de m dans le total de la tranche
+                       ("ratio", num, den)    ratio de sommes, ex. taux de marge
+        - slices   : {libellé: filtres where} ; une passe par tranche, les
+                     résultats sont empilés avec le libellé dans `slice_col`
+
+        >>> cube.aggregate(["Category"],
+        ...                {"Margin Rate": ("ratio", "Margin", "Revenue")},
+        ...                slices={"Actual 2024": {"Scenario": "Actual", "Year": 2024}})
+        """
+        frames = []
+        for label, where in (slices or {None: None}).items():
+            sums = self.query(by=by, where=where)
+            out = sums[list(by)].copy()
+            for name, spec in measures.items():
+                kind, measure = spec[0], spec[1]
+                if kind == "sum":
+                    out[name] = sums[measure]
+                elif kind == "share":
+                    out[name] = sums[measure] / sums[measure].sum()
+                elif kind == "ratio":
+                    out[name] = sums[measure] / sums[spec[2]]
+                else:
+                    raise ValueError(f"Mesure inconnue : {spec!r}")
+            if label is not None:
+                out[slice_col] = label
+            frames.append(out)
+        return pd.concat(frames, ignore_index=True)
+
+
+def rollup_sets(hierarchy) -> list:
+    """Ensembles ROLLUP d'une hiérarchie : (a, b, c), (a, b), (a,), ()."""
+    hierarchy = tuple(hierarchy)
+    return [hierarchy[:i] for i in range(len(hierarchy), -1, -1)]
+
+
+@traced("aggregate:grouping_sets")
+def grouping_sets(frame: pd.DataFrame, sets, measures) -> dict:
+    """
+    Sémantique GROUPING SETS : somme des `measures` de `frame` pour chaque
+    ensemble de dimensions de `sets` (le tuple vide donne le total général).
+
+    Chaque dimension est factorisée une seule fois et chaque niveau est une
+    somme np.bincount sur ces codes : ajouter un niveau ne relance pas un
+    groupby complet. Comme pandas.groupby, les lignes dont une clé est
+    manquante sont ignorées pour ce niveau. Renvoie {ensemble: DataFrame}.
+    """
+    values = {m: frame[m].to_numpy(dtype=float) for m in measures}
+    factorized = {}
+    levels = {}
+    for dims in sets:
+        dims = tuple(dims)
+        if not dims:
+            levels[dims] = pd.DataFrame({m: [values[m].sum()] for m in measures})
+            continue
+
+        for dim in dims:
+            if dim not in factorized:
+                factorized[dim] = pd.factorize(frame[dim], sort=True)
+        codes = [factorized[dim][0] for dim in dims]
+        shape = [len(factorized[dim][1]) for dim in dims]
+
+        valid = np.logical_and.reduce([c >= 0 for c in codes])
+        flat = np.ravel_multi_index([c[valid] for c in codes], shape)
+        groups, inverse = np.unique(flat, return_inverse=True)
+
+        keys = np.unravel_index(groups, shape)
+        out = pd.DataFrame({
+            dim: factorized[dim][1].take(key) for dim, key in zip(dims, keys)
+        })
+        for m in measures:
+            out[m] = np.bincount(inverse, weights=values[m][valid], minlength=len(groups))
+        levels[dims] = out
+    return levels
+
+
+@traced("aggregate:build_cube")
+def build_cube(fact: pd.DataFrame, version: str = "") -> Cube:
+    """Matérialise le cube à partir de la table de faits du Dataset."""
+    cells = (
+        fact
+        .assign(Rows=1)
+        .groupby(DIMENSIONS, observed=True, as_index=False)[MEASURES]
+        .sum()
+    )
+    for attr, dim in ATTRIBUTES.items():
+        lookup = fact[[dim, attr]].drop_duplicates(dim).set_index(dim)[attr]
+        cells[attr] = cells[dim].map(lookup).astype(fact[attr].dtype)
+    index = BitmapIndex(cells, DIMENSIONS + list(ATTRIBUTES))
+    return Cube(cells=cells, index=index, version=version)
+
+
+@tracked_cache("cube")
+@st.cache_resource(show_spinner="Construction du cube…")
+def _cube_for_version(version: str) -> Cube:
+    return build_cube(load_dataset().fact, version)
+
+
+def load_cube() -> Cube:
+    """Cube construit une fois par process (et par version des données)."""
+    return _cube_for_version(load_dataset().version)
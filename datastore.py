@@ -0,0 +1,219 @@
+# datastore.py
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+
+import pandas as pd
+import streamlit as st
+
+from memory import account, freeze, get_ledger, nbytes
+from tracing import span, traced
+
+# Répertoire du cache colonne (Arrow IPC), surchargeable par variable d'env.
+CACHE_DIR = os.environ.get("FPNA_CACHE_DIR", "./.cache")
+
+# Sources du Dataset, surchargeables par variable d'env. (benchmarks, jeux
+# synthétiques) : .xlsx, .csv, .parquet ou Arrow IPC (.arrow / .feather)
+FACT_PATH = os.environ.get("FPNA_FACT_PATH", "./Data/df_fact.xlsx")
+CLIENT_DIM_PATH = os.environ.get("FPNA_CLIENT_DIM_PATH", "./Data/final_client_dimension.xlsx")
+
+# Lecteurs des formats non colonnes, mis en cache en Arrow IPC
+_ROW_READERS = {".xlsx": pd.read_excel, ".xls": pd.read_excel, ".csv": pd.read_csv}
+
+# Moteur SQL de datastore.query() : "duckdb" (en process, défaut) ou
+# "sqlite" (base fichier indexée partagée, voir sqlite_store.py)
+SQL_BACKEND = os.environ.get("FPNA_SQL_BACKEND", "duckdb")
+
+# Colonnes dimension stockées en catégories (une seule copie de chaque libellé)
+DIMENSIONS = ["Country", "Category", "Subcategory", "Client", "Scenario", "Segment"]
+
+
+def _file_digest(path: str) -> str:
+    """SHA-256 du fichier source, lu par blocs."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cache_paths(path: str):
+    # Nom lisible + empreinte du chemin absolu : deux sources de même nom
+    # dans des répertoires différents ont chacune leur cache
+    name = os.path.splitext(os.path.basename(path))[0]
+    key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12]
+    base = os.path.join(CACHE_DIR, f"{name}-{key}")
+    return base + ".arrow", base + ".json"
+
+
+def read_source_cached(path: str) -> tuple[pd.DataFrame, str]:
+    """
+    Lit une source du Dataset avec un cache colonne sur disque ; renvoie
+    (DataFrame, empreinte SHA-256 du fichier source).
+
+    Classeurs et CSV : le premier appel parse le fichier et écrit un fichier
+    Arrow IPC non compressé (mappable en mémoire) ; les appels suivants le
+    relisent sans passer par openpyxl. Le cache est invalidé si le mtime/la
+    taille du fichier source changent ET que son empreinte SHA-256 diffère.
+    Les sources déjà en colonnes (Parquet, Arrow IPC) sont lues directement.
+
+    L'empreinte est conservée dans le fichier .json du cache avec le mtime
+    et la taille : le fichier n'est relu pour la calculer que s'il a changé.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    columnar = ext in (".arrow", ".feather", ".ipc", ".parquet")
+    if not columnar and ext not in _ROW_READERS:
+        raise ValueError(f"Format de source non pris en charge : {path}")
+
+    arrow_path, meta_path = _cache_paths(path)
+    stat = os.stat(path)
+
+    meta = None
+    if os.path.exists(meta_path) and (columnar or os.path.exists(arrow_path)):
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+    if meta is not None and meta["mtime_ns"] == stat.st_mtime_ns and meta["size"] == stat.st_size:
+        digest = meta["sha256"]
+    else:
+        # Fichier nouveau ou « touché » : on ne reconstruit que si le contenu a changé
+        digest = _file_digest(path)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        if meta is not None and meta["sha256"] != digest:
+            meta = None   # contenu modifié : cache Arrow à reconstruire
+        if meta is not None or columnar:
+            _write_meta(meta_path, stat, digest)
+
+    if columnar:
+        df = pd.read_parquet(path) if ext == ".parquet" else _read_arrow(path)
+        return df, digest
+    if meta is not None:
+        return _read_arrow(arrow_path), digest
+
+    df = _ROW_READERS[ext](path)
+    tmp_path = f"{arrow_path}.{os.getpid()}.tmp"
+    df.to_feather(tmp_path, compression="uncompressed")
+    os.replace(tmp_path, arrow_path)
+    _write_meta(meta_path, stat, digest)
+    return df, digest
+
+
+def _read_arrow(arrow_path: str) -> pd.DataFrame:
+    import pyarrow.feather as feather  # différé : seulement au chargement du Dataset
+    return feather.read_table(arrow_path, memory_map=True).to_pandas()
+
+
+def _write_meta(meta_path: str, stat, digest: str):
+    tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": digest}, f)
+    os.replace(tmp_path, meta_path)
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """
+    Jeu de données partagé par toutes les pages (une instance par process).
+
+    - fact    : table de faits jointe au segment client, avec les mesures
+                Revenue / Cost / Margin et les colonnes Year / MonthNum /
+                MonthName / Period (clé entière YYYYMM)
+    - clients : dimension client (Client, Segment, Region, Cluster, Manager…)
+    - version : empreinte des fichiers sources, à utiliser comme clé de cache
+
+    Les DataFrames sont partagés entre sessions : ce sont des FrozenFrame
+    (memory.freeze), qui lèvent ValueError sur toute modification en place
+    (affectation de colonne, .loc / .iloc, inplace=True…). Filtrer, faire
+    un .assign() ou un .copy() donne un DataFrame local modifiable.
+    """
+    fact: pd.DataFrame
+    clients: pd.DataFrame
+    version: str
+
+
+def _prepare_clients(dim: pd.DataFrame) -> pd.DataFrame:
+    dim = dim.loc[:, ~dim.columns.str.contains(r"^Unnamed")]
+    return dim.rename(columns={"Client Segment": "Segment"})
+
+
+def _prepare_fact(df: pd.DataFrame, clients: pd.DataFrame) -> pd.DataFrame:
+    df = df.loc[:, ~df.columns.str.contains(r"^Unnamed")]
+    df = df.merge(clients[["Client", "Segment"]], on="Client", how="left")
+    df["Date"] = pd.to_datetime(df["Date"])
+
+    # Mesures dérivées « officielles » : pas d'arrondi, en euros
+    df["Revenue"] = df["Volume"] * df["Unit Price"]
+    df["Cost"] = df["Volume"] * df["Unit Cost"]
+    df["Margin"] = df["Revenue"] - df["Cost"]
+
+    df["Year"] = df["Date"].dt.year
+    df["MonthNum"] = df["Date"].dt.month
+    df["Period"] = df["Year"] * 100 + df["MonthNum"]  # clé période YYYYMM
+    df["MonthName"] = df["Date"].dt.strftime("%b").astype("category")
+
+    for col in DIMENSIONS:
+        df[col] = df[col].astype("category")
+    return df
+
+
+@st.cache_resource(show_spinner="Chargement des données…")
+@traced("load_data")
+def load_dataset() -> Dataset:
+    """Charge la table de faits et la dimension client une fois par process."""
+    clients, clients_digest = read_source_cached(CLIENT_DIM_PATH)
+    fact, fact_digest = read_source_cached(FACT_PATH)
+    clients = _prepare_clients(clients)
+    fact = _prepare_fact(fact, clients)
+    version = hashlib.sha256((fact_digest + clients_digest).encode()).hexdigest()[:16]
+    # Une seule copie par process, en vues NumPy non inscriptibles
+    data = Dataset(fact=freeze(fact), clients=freeze(clients), version=version)
+    size = nbytes(data.fact, deep=True) + nbytes(data.clients, deep=True)
+    get_ledger().add_shared("dataset", lambda: size)
+    return data
+
+
+@st.cache_resource
+def get_engine() -> "duckdb.DuckDBPyConnection":
+    """Moteur SQL analytique en process (DuckDB), partagé par toutes les sessions."""
+    import duckdb  # différé : les pages qui n'utilisent que le cube ne le chargent pas
+    con = duckdb.connect(":memory:")
+    # Mémoire gérée par DuckDB (tables de hachage, tris…), hors DataFrames enregistrés
+    get_ledger().add_shared("duckdb", lambda: con.cursor().execute(
+        "SELECT COALESCE(SUM(memory_usage_bytes), 0) FROM duckdb_memory()"
+    ).fetchone()[0], kind="connection")
+    return con
+
+
+def query(sql: str, params=None) -> pd.DataFrame:
+    """
+    Exécute une requête SQL directement sur les DataFrames du Dataset.
+
+    Les vues Fact (table de faits avec Revenue / Cost / Margin / Segment) et
+    DimClient sont enregistrées sur le DataFrame en mémoire : aucune copie,
+    aucune sérialisation, et Date reste un TIMESTAMP natif (pas de
+    pd.to_datetime à refaire). Chaque appel ouvre son propre curseur, ce qui
+    permet des requêtes concurrentes depuis plusieurs sessions.
+
+    Avec FPNA_SQL_BACKEND=sqlite, la même requête part sur la base SQLite
+    fichier partagée (sqlite_store.py). Filtrer les dates sur la colonne
+    Period (YYYYMM) pour profiter de ses index.
+
+    Le résultat (propre à l'appelant) est compté dans la mémoire de la
+    session courante (memory.account).
+    """
+    label = "query:" + hashlib.sha1(sql.encode()).hexdigest()[:8]
+    with span("query", sql=label[6:], backend=SQL_BACKEND):
+        if SQL_BACKEND == "sqlite":
+            import sqlite_store
+            return account(label, sqlite_store.query(sql, params))
+
+        data = load_dataset()
+        cur = get_engine().cursor()
+        try:
+            cur.register("Fact", data.fact)
+            cur.register("DimClient", data.clients)
+            return account(label, cur.execute(sql, params).df())
+        finally:
+            cur.close()
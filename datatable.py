@@ -0,0 +1,111 @@
+# datatable.py
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from tracing import span
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+@dataclass(frozen=True)
+class TablePage:
+    """Page visible d'une table : seules ces lignes sont envoyées au navigateur."""
+    rows: pd.DataFrame
+    total_rows: int    # lignes après filtres
+    page: int          # numérotée à partir de 1
+    n_pages: int
+
+
+def filter_mask(df: pd.DataFrame, filters: dict = None, search: str = "", search_cols=()) -> np.ndarray:
+    """
+    Masque booléen des lignes retenues : pour chaque colonne de `filters`,
+    valeur dans la liste (une liste vide ne filtre pas) ; `search` est une
+    sous-chaîne cherchée (sans casse) dans au moins une des `search_cols`.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for col, values in (filters or {}).items():
+        if values:
+            mask &= df[col].isin(values).to_numpy()
+    if search:
+        found = np.zeros(len(df), dtype=bool)
+        for col in search_cols:
+            found |= df[col].astype(str).str.contains(search, case=False, regex=False).to_numpy()
+        mask &= found
+    return mask
+
+
+def paginate(df: pd.DataFrame, mask: np.ndarray = None, sort_by: str = None,
+             ascending: bool = True, page: int = 1, page_size: int = PAGE_SIZES[0]) -> TablePage:
+    """
+    Filtre, trie et découpe `df` côté serveur. Le tri porte sur la seule
+    colonne `sort_by` des lignes filtrées (valeurs manquantes en dernier) ;
+    seules les lignes de la page demandée sont extraites de `df`.
+    """
+    positions = np.arange(len(df)) if mask is None else np.flatnonzero(mask)
+    if sort_by is not None:
+        key = df[sort_by].iloc[positions].reset_index(drop=True)
+        order = key.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+        positions = positions[order]
+    n_pages = max(1, -(-len(positions) // page_size))
+    page = min(max(1, page), n_pages)
+    start = (page - 1) * page_size
+    return TablePage(df.iloc[positions[start:start + page_size]], len(positions), page, n_pages)
+
+
+def sign_colors(rows: pd.DataFrame, columns) -> pd.DataFrame:
+    """
+    Styles CSS « vert si > 0, rouge sinon » pour `columns`, calculés par
+    masques de colonnes (pour Styler.apply(axis=None)).
+    """
+    styles = pd.DataFrame("", index=rows.index, columns=rows.columns)
+    for col in columns:
+        styles[col] = np.where(rows[col].to_numpy(dtype=float) > 0, "color: green", "color: red")
+    return styles
+
+
+def paginated_table(df: pd.DataFrame, key: str, formats: dict = None, colored=(),
+                    filter_cols=(), search_cols=()):
+    """
+    Table paginée côté serveur : recherche, filtres par colonne, tri et
+    taille de page ; le formatage et les couleurs ne sont appliqués qu'à la
+    page affichée.
+    """
+    c_search, c_sort, c_order, c_size = st.columns([3, 2, 1, 1])
+    search = c_search.text_input("Recherche", key=f"{key}_search") if search_cols else ""
+    sort_by = c_sort.selectbox("Trier par", list(df.columns), index=len(df.columns) - 1, key=f"{key}_sort")
+    ascending = c_order.radio("Ordre", ["↓", "↑"], horizontal=True, key=f"{key}_order") == "↑"
+    page_size = c_size.selectbox("Lignes", PAGE_SIZES, key=f"{key}_size")
+
+    filters = {}
+    if filter_cols:
+        for col, container in zip(filter_cols, st.columns(len(filter_cols))):
+            options = sorted(df[col].dropna().unique().tolist())
+            filters[col] = container.multiselect(col, options, key=f"{key}_filter_{col}")
+
+    with span("aggregate:paginate", table=key):
+        mask = filter_mask(df, filters, search, search_cols)
+        # Page ramenée dans les bornes quand les filtres réduisent la table
+        n_pages = max(1, -(-int(mask.sum()) // page_size))
+        if st.session_state.get(f"{key}_page", 1) > n_pages:
+            st.session_state[f"{key}_page"] = n_pages
+        result = paginate(df, mask, sort_by, ascending, st.session_state.get(f"{key}_page", 1), page_size)
+
+    # Styler et sérialisation de la page affichée
+    with span("table", table=key, rows=len(result.rows)):
+        styled = result.rows.style.apply(sign_colors, columns=list(colored), axis=None)
+        if formats:
+            styled = styled.format(formats)
+        st.dataframe(styled, hide_index=True, use_container_width=True)
+
+    c_page, c_info = st.columns([1, 3])
+    c_page.number_input("Page", min_value=1, max_value=result.n_pages, step=1, key=f"{key}_page")
+    start = (result.page - 1) * page_size
+    c_info.caption(
+        f"Lignes {start + 1 if result.total_rows else 0}–{start + len(result.rows)} "
+        f"sur {result.total_rows:,} · page {result.page} / {result.n_pages}"
+    )
+    return result
@@ -0,0 +1,138 @@
+# figcache.py
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import streamlit as st
+
+import visuals
+from datastore import load_dataset
+from memory import get_ledger
+from tracing import span
+
+# Plafond mémoire du cache de figures (JSON sérialisé), en Mo
+MAX_MB = float(os.environ.get("FPNA_FIGURE_CACHE_MB", "64"))
+
+
+def normalize(state):
+    """
+    Forme canonique et hashable d'un état de filtres : dictionnaires triés
+    par clé, listes / ensembles triés (sélections : l'ordre de clic d'un
+    multiselect ne change pas la figure), tuples et tableaux gardés dans
+    l'ordre (valeurs positionnelles), scalaires NumPy en types Python.
+    """
+    if isinstance(state, dict):
+        return tuple(sorted((str(k), normalize(v)) for k, v in state.items()))
+    if isinstance(state, (list, set, frozenset)):
+        items = [normalize(v) for v in state]
+        try:
+            return tuple(sorted(items))
+        except TypeError:
+            return tuple(items)
+    if isinstance(state, (tuple, np.ndarray)):
+        return tuple(normalize(v) for v in state)
+    if isinstance(state, np.generic):
+        return state.item()
+    return state
+
+
+class FigureCache:
+    """
+    Cache LRU de figures Plotly sérialisées en JSON, borné en octets et
+    partagé par toutes les sessions (accès protégé par un verrou).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # clé -> JSON (bytes)
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, payload: bytes):
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= len(self._entries.pop(key))
+            if len(payload) > self.max_bytes:
+                return
+            self._entries[key] = payload
+            self.nbytes += len(payload)
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+                self.evictions += 1
+
+    def reclaim(self, nbytes: int) -> int:
+        """Évince les entrées les moins récemment utilisées pour libérer ~nbytes ; renvoie les octets libérés."""
+        freed = 0
+        with self._lock:
+            while self._entries and freed < nbytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+                self.evictions += 1
+                freed += len(evicted)
+        return freed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+@st.cache_resource
+def get_figure_cache() -> FigureCache:
+    """Cache de figures du process (réduit en LRU quand le budget mémoire est dépassé)."""
+    cache = FigureCache(int(MAX_MB * 1024 * 1024))
+    get_ledger().add_shared("figure_cache", lambda: cache.nbytes, cache.reclaim)
+    return cache
+
+
+def cached_figure(page: str, chart_id: str, state, build) -> "go.Figure":
+    """
+    Figure `chart_id` de la page, servie depuis le cache si elle a déjà été
+    construite pour le même état de filtres et la même version des données ;
+    sinon `build()` la construit (requêtes comprises) et elle est mise en cache.
+
+    `state` doit contenir tout ce dont dépend la figure (filtres, widgets).
+    """
+    with span(f"figure:{chart_id}", page=page) as details:
+        key = (page, chart_id, normalize(state), load_dataset().version)
+        cache = get_figure_cache()
+        payload = cache.get(key)
+        if details is not None:
+            details["cache"] = "hit" if payload is not None else "miss"
+        if payload is not None:
+            # Plotly n'est importé qu'ici et dans build() : pas au chargement de la page
+            import plotly.io as pio
+            return pio.from_json(payload.decode())
+        visuals.register()  # template par défaut, enregistré au premier build du process
+        fig = build()
+        cache.put(key, fig.to_json().encode())
+        return fig
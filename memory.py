@@ -0,0 +1,440 @@
+# memory.py
+
+import dataclasses
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Budget mémoire du process (structures partagées + données des sessions), en Mo
+MEMORY_BUDGET_MB = float(os.environ.get("FPNA_MEMORY_BUDGET_MB", "1024"))
+# Une session sans rerun depuis SESSION_TTL_S secondes n'est plus comptée
+SESSION_TTL_S = float(os.environ.get("FPNA_SESSION_TTL_S", "1800"))
+# Une entrée de cache utilisée depuis moins de EVICT_IDLE_S secondes n'est pas évincée
+EVICT_IDLE_S = float(os.environ.get("FPNA_EVICT_IDLE_S", "60"))
+# Hors chemin critique : account() n'applique le budget qu'au plus toutes les
+# ENFORCE_INTERVAL_S secondes, ou dès que ENFORCE_DELTA_MB Mo ont été attribués
+ENFORCE_INTERVAL_S = float(os.environ.get("FPNA_MEMORY_ENFORCE_INTERVAL_S", "5"))
+ENFORCE_DELTA_MB = float(os.environ.get("FPNA_MEMORY_ENFORCE_DELTA_MB", "64"))
+# Page Memory Admin : modifier le plafond et forcer les évictions (sinon lecture seule)
+MEMORY_ADMIN = os.environ.get("FPNA_MEMORY_ADMIN", "0") == "1"
+# Rapport mémoire JSON réécrit périodiquement (vide = désactivé)
+REPORT_FILE = os.environ.get("FPNA_MEMORY_REPORT_FILE", "")
+REPORT_INTERVAL_S = float(os.environ.get("FPNA_MEMORY_REPORT_INTERVAL_S", "60"))
+
+
+def nbytes(obj, deep: bool = False, _seen=None) -> int:
+    """
+    Taille estimée d'un objet en octets : buffers pour les DataFrame / Series
+    / tableaux NumPy (`deep` compte aussi les chaînes des colonnes objet),
+    attribut entier `nbytes` s'il existe (cache de figures, pool…), somme
+    des champs pour les dataclasses (cube, moteurs) et des éléments pour les
+    conteneurs, sys.getsizeof sinon. Un objet partagé n'est compté qu'une fois.
+    """
+    _seen = set() if _seen is None else _seen
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=deep).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=deep))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(nbytes(k, deep, _seen) + nbytes(v, deep, _seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sum(nbytes(v, deep, _seen) for v in obj)
+    if isinstance(getattr(obj, "nbytes", None), int):
+        return obj.nbytes
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return sys.getsizeof(obj) + sum(
+            nbytes(getattr(obj, f.name), deep, _seen) for f in dataclasses.fields(obj)
+        )
+    return sys.getsizeof(obj)
+
+
+_READ_ONLY = "DataFrame partagé en lecture seule : travailler sur une copie (.copy(), .assign(), filtre)"
+
+
+class _ReadOnlyIndexer:
+    """Indexeur (.loc, .iloc, .at, .iat) d'un FrozenFrame : lecture seule."""
+
+    def __init__(self, indexer):
+        self._indexer = indexer
+
+    def __getattr__(self, name):
+        # pandas appelle des méthodes internes de l'indexeur (_getitem_axis…)
+        return getattr(self._indexer, name)
+
+    def __getitem__(self, key):
+        return self._indexer[key]
+
+    def __setitem__(self, key, value):
+        raise ValueError(_READ_ONLY)
+
+    def __call__(self, *args, **kwargs):
+        return _ReadOnlyIndexer(self._indexer(*args, **kwargs))
+
+
+class FrozenFrame(pd.DataFrame):
+    """
+    DataFrame partagé en lecture seule (voir freeze). Lèvent ValueError :
+    l'affectation ou la suppression de colonnes (df[c] = …, del, insert,
+    pop), les écritures via .loc / .iloc / .at / .iat, les méthodes
+    inplace=True et opérateurs en place (+=…), et la réaffectation de
+    .index / .columns. Les opérations qui produisent un nouvel objet
+    (filtres, .assign(), .copy(), groupby…) renvoient un DataFrame ordinaire.
+    """
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    def __setitem__(self, key, value):
+        raise ValueError(_READ_ONLY)
+
+    def __delitem__(self, key):
+        raise ValueError(_READ_ONLY)
+
+    def __setattr__(self, name, value):
+        if name in ("index", "columns"):
+            raise ValueError(_READ_ONLY)
+        super().__setattr__(name, value)
+
+    def insert(self, *args, **kwargs):
+        raise ValueError(_READ_ONLY)
+
+    def _update_inplace(self, result, verify_is_copy: bool = True):
+        # Point de passage des méthodes inplace=True et des opérateurs en place
+        raise ValueError(_READ_ONLY)
+
+    @property
+    def loc(self):
+        return _ReadOnlyIndexer(super().loc)
+
+    @property
+    def iloc(self):
+        return _ReadOnlyIndexer(super().iloc)
+
+    @property
+    def at(self):
+        return _ReadOnlyIndexer(super().at)
+
+    @property
+    def iat(self):
+        return _ReadOnlyIndexer(super().iat)
+
+
+def freeze(df: pd.DataFrame) -> FrozenFrame:
+    """
+    Vue en lecture seule de `df`, sans copie des données (FrozenFrame) :
+    le DataFrame refuse toute modification (voir FrozenFrame) et chaque
+    colonne non objet repose sur un tableau NumPy non inscriptible (codes
+    pour les catégories), si bien qu'une écriture passant par une colonne
+    extraite (df[c].iloc[0] = …, df[c].to_numpy()[0] = …) lève aussi
+    ValueError.
+
+    Exception : les colonnes objet (chaînes) sont reprises telles quelles,
+    car plusieurs routines Cython de pandas refusent les tableaux objet non
+    inscriptibles ; une écriture sur la Series extraite d'une telle colonne
+    n'est pas bloquée. Les dimensions partagées sont stockées en catégories.
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col].array
+        if isinstance(values, pd.Categorical):
+            codes = values.codes  # vue déjà en lecture seule
+            values = pd.Categorical.from_codes(codes, dtype=values.dtype)
+        elif df[col].dtype != object:
+            values = df[col].to_numpy().view()
+            values.flags.writeable = False
+        columns[col] = values
+    return FrozenFrame(columns, index=df.index, copy=False)
+
+
+class MemoryLedger:
+    """
+    Comptabilité mémoire du process :
+
+    - structures partagées (Dataset, cache de figures…) et connexions
+      (DuckDB, pool SQLite), avec leur taille courante ;
+    - entrées des caches Streamlit suivis (`tracked_cache`), mesurées à la
+      création, avec leur dernier usage ;
+    - octets détenus par chaque session (résultats de requêtes).
+
+    Au-delà du budget, les structures partagées qui savent se réduire (cache
+    de figures…) libèrent d'abord de la place, puis les entrées de cache
+    sont évincées de la moins récemment utilisée à la plus récente (hors
+    entrées épinglées et entrées utilisées depuis moins de EVICT_IDLE_S s).
+    """
+
+    def __init__(self, budget_bytes: int, session_ttl: float = SESSION_TTL_S,
+                 evict_idle: float = EVICT_IDLE_S):
+        self.budget_bytes = budget_bytes
+        self.session_ttl = session_ttl
+        self.evict_idle = evict_idle
+        self._shared = {}     # nom -> (taille(), libérer(n) ou None, type)
+        self._entries = {}    # (cache, clé) -> {"bytes", "created", "used", "hits", "evict", "pinned"}
+        self._sessions = {}   # session -> {libellé: octets}
+        self._seen = {}       # session -> dernier rerun (time.monotonic)
+        self.evictions = {"entries": 0, "bytes": 0}
+        self._reported = 0.0
+        self._enforced = 0.0    # dernier enforce() (time.monotonic)
+        self._pending = 0       # octets attribués depuis
+        self._lock = threading.Lock()
+
+    def add_shared(self, name: str, size, reclaim=None, kind: str = "shared"):
+        """
+        Enregistre une structure partagée (`kind` "shared" ou "connection") :
+        `size()` -> octets, `reclaim(n)` libère ~n octets.
+        """
+        with self._lock:
+            self._shared[name] = (size, reclaim, kind)
+
+    def touch(self, cache: str, key: str, size, evict, pinned: bool = False,
+              max_entries: int = None, label: str = None):
+        """
+        Usage d'une entrée de cache : `size()` n'est appelé qu'à la création
+        de l'entrée, `evict()` la retire du cache sous-jacent. `max_entries`
+        reproduit l'éviction LRU propre au cache Streamlit (max_entries=…).
+        `label` est le libellé affiché dans le rapport (défaut : `key`).
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((cache, key))
+            if entry is not None:
+                entry["used"] = now
+                entry["hits"] += 1
+                return
+        n = int(size())
+        with self._lock:
+            self._entries.setdefault((cache, key), {
+                "bytes": n, "created": now, "used": now, "hits": 0, "evict": evict, "pinned": pinned,
+                "label": key if label is None else label,
+            })
+            if max_entries is not None:
+                same = sorted((e["used"], k) for k, e in self._entries.items() if k[0] == cache)
+                for _, k in same[:max(0, len(same) - max_entries)]:
+                    del self._entries[k]
+
+    def forget(self, cache: str = None, key: str = None):
+        """Oublie l'entrée `key` de `cache` (tout le cache sans clé, tout sans cache) après un .clear()."""
+        with self._lock:
+            for k in [k for k in self._entries if cache in (None, k[0]) and key in (None, k[1])]:
+                del self._entries[k]
+
+    def record(self, session_id: str, label: str, n: int):
+        """Octets détenus par la session pour `label` (la dernière valeur remplace la précédente)."""
+        with self._lock:
+            self._sessions.setdefault(session_id, {})[label] = n
+            self._seen[session_id] = time.monotonic()
+
+    def drop(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._seen.pop(session_id, None)
+
+    def _expire(self):
+        limit = time.monotonic() - self.session_ttl
+        for session_id in [s for s, t in self._seen.items() if t < limit]:
+            self._sessions.pop(session_id, None)
+            self._seen.pop(session_id, None)
+
+    def shared(self, kind: str = None) -> dict:
+        with self._lock:
+            sources = [(name, size) for name, (size, _, k) in self._shared.items() if kind in (None, k)]
+        return {name: int(size()) for name, size in sources}
+
+    def entries(self) -> dict:
+        """(cache, clé) -> octets des entrées de cache suivies."""
+        with self._lock:
+            return {k: e["bytes"] for k, e in self._entries.items()}
+
+    def sessions(self) -> dict:
+        with self._lock:
+            self._expire()
+            return {s: dict(labels) for s, labels in self._sessions.items()}
+
+    def total(self) -> int:
+        return (sum(self.shared().values()) + sum(self.entries().values())
+                + sum(sum(labels.values()) for labels in self.sessions().values()))
+
+    def _evict_lru(self, nbytes: int) -> int:
+        limit = time.monotonic() - self.evict_idle
+        with self._lock:
+            candidates = sorted(
+                (e["used"], k) for k, e in self._entries.items() if not e["pinned"] and e["used"] < limit
+            )
+        freed = 0
+        for _, k in candidates:
+            if freed >= nbytes:
+                break
+            with self._lock:
+                entry = self._entries.pop(k, None)
+            if entry is None:
+                continue
+            entry["evict"]()
+            freed += entry["bytes"]
+            self.evictions["entries"] += 1
+            self.evictions["bytes"] += entry["bytes"]
+        return freed
+
+    def maybe_enforce(self, added: int = 0, interval: float = ENFORCE_INTERVAL_S,
+                      delta: float = ENFORCE_DELTA_MB * 1024 * 1024) -> int:
+        """
+        enforce() limité : seulement si `interval` s se sont écoulées depuis
+        le précédent ou si `delta` octets ont été attribués depuis (le calcul
+        du total interroge toutes les structures, DuckDB compris).
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._pending += added
+            if now - self._enforced < interval and self._pending < delta:
+                return 0
+        return self.enforce()
+
+    def enforce(self) -> int:
+        """Ramène le total sous le budget si possible ; renvoie les octets libérés."""
+        with self._lock:
+            self._enforced, self._pending = time.monotonic(), 0
+        excess = self.total() - self.budget_bytes
+        freed = 0
+        with self._lock:
+            reclaimers = [r for _, r, _ in self._shared.values() if r is not None]
+        for reclaim in reclaimers:
+            if excess - freed <= 0:
+                break
+            freed += reclaim(excess - freed)
+        if excess - freed > 0:
+            freed += self._evict_lru(excess - freed)
+        self.maybe_write_report()
+        return freed
+
+    def report(self) -> dict:
+        """Instantané de la comptabilité : par structure, connexion, entrée de cache et session."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire()
+            entries = [
+                {"cache": c, "key": e["label"], "bytes": e["bytes"], "hits": e["hits"], "pinned": e["pinned"],
+                 "age_s": round(now - e["created"], 1), "idle_s": round(now - e["used"], 1)}
+                for (c, k), e in self._entries.items()
+            ]
+            sessions = [
+                {"session": sid, "bytes": sum(labels.values()), "labels": dict(labels),
+                 "idle_s": round(now - self._seen.get(sid, now), 1)}
+                for sid, labels in self._sessions.items()
+            ]
+            kinds = {name: kind for name, (_, _, kind) in self._shared.items()}
+            evictions = dict(self.evictions)
+        shared = self.shared()
+        structures = [{"name": n, "kind": kinds[n], "bytes": b} for n, b in shared.items()]
+        return {
+            "timestamp": time.time(),
+            "pid": os.getpid(),
+            "rss_bytes": rss_bytes(),
+            "budget_bytes": self.budget_bytes,
+            "total_bytes": (sum(shared.values()) + sum(e["bytes"] for e in entries)
+                            + sum(s["bytes"] for s in sessions)),
+            "structures": structures,
+            "cache_entries": sorted(entries, key=lambda e: -e["bytes"]),
+            "sessions": sorted(sessions, key=lambda s: -s["bytes"]),
+            "evictions": evictions,
+        }
+
+    def maybe_write_report(self, path: str = REPORT_FILE, force: bool = False):
+        """Écrit le rapport en JSON (atomique), au plus toutes les REPORT_INTERVAL_S secondes sauf `force`."""
+        now = time.monotonic()
+        if not path or (not force and now - self._reported < REPORT_INTERVAL_S):
+            return
+        self._reported = now
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def rss_bytes() -> int:
+    """Mémoire résidente du process (Linux : /proc ; ailleurs : pic via getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+@st.cache_resource
+def get_ledger() -> MemoryLedger:
+    """Comptabilité mémoire du process."""
+    return MemoryLedger(int(MEMORY_BUDGET_MB * 1024 * 1024))
+
+
+def _entry_key(args, kwargs):
+    """(clé, libellé) d'une entrée : empreinte du repr complet des arguments, et son début lisible."""
+    key = ", ".join([repr(a) for a in args] + [f"{k}={v!r}" for k, v in kwargs.items()])
+    return hashlib.sha1(key.encode()).hexdigest(), key[:120]
+
+
+def tracked_cache(name: str, pinned: bool = False, max_entries: int = None):
+    """
+    Décorateur à placer au-dessus de @st.cache_resource / @st.cache_data
+    (reporter leur `max_entries`) : chaque appel, hit ou miss, date l'usage
+    de l'entrée de ces arguments, mesurée (nbytes profond) à sa création.
+    Hors `pinned`, l'entrée peut être évincée par le budget
+    (func.clear(*args) de Streamlit).
+    """
+    def decorator(cached):
+        @wraps(cached)
+        def wrapper(*args, **kwargs):
+            result = cached(*args, **kwargs)
+            key, label = _entry_key(args, kwargs)
+            get_ledger().touch(
+                name, key,
+                lambda: nbytes(result, deep=True),
+                lambda: cached.clear(*args, **kwargs),
+                pinned, max_entries, label,
+            )
+            return result
+
+        def clear(*args, **kwargs):
+            cached.clear(*args, **kwargs)
+            get_ledger().forget(name, _entry_key(args, kwargs)[0] if args or kwargs else None)
+
+        wrapper.clear = clear
+        return wrapper
+    return decorator
+
+
+def current_session_id():
+    """Identifiant de la session Streamlit en cours (None hors script)."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+
+def account(label: str, obj):
+    """
+    Attribue `obj` à la session courante sous `label`, applique le budget
+    (au plus périodiquement, voir maybe_enforce) et renvoie `obj` inchangé
+    (utilisable en ligne : `return account(..., df)`).
+    """
+    session_id = current_session_id()
+    if session_id is not None:
+        ledger = get_ledger()
+        n = nbytes(obj)
+        ledger.record(session_id, label, n)
+        ledger.maybe_enforce(n)
+    return obj
@@ -0,0 +1,117 @@
+# montecarlo.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context
+
+import numpy as np
+
+# Module volontairement limité à NumPy : les processus du pool l'importent
+# sans charger Streamlit ni les données.
+
+DISTRIBUTIONS = ["Normal", "Triangular"]
+# Taille fixe des blocs de tirages : un flux RNG par bloc, donc des résultats
+# identiques quel que soit le nombre de processus
+CHUNK_SIZE = 100_000
+# Au-delà de ce nombre de tirages, les blocs sont répartis sur un pool de processus
+PARALLEL_THRESHOLD = int(os.environ.get("FPNA_MC_PARALLEL_THRESHOLD", 200_000))
+MAX_WORKERS = int(os.environ.get("FPNA_MC_WORKERS", 0)) or None
+# Quantiles affichés (P10 / P50 / P90)
+QUANTILES = (0.1, 0.5, 0.9)
+# z de la loi normale pour P90 : les bornes d'une loi normale sont ses P10 / P90
+_Z90 = 1.2815515655446004
+
+
+@dataclass(frozen=True)
+class GrowthDistribution:
+    """
+    Loi de la croissance de volume (en fraction, ex. 0.02), tirée
+    indépendamment pour chaque cellule pays × catégorie sélectionnée.
+
+    - Normal     : bornes [low, high] = P10 / P90, donc centrée sur leur
+                   milieu (`mode` n'est pas utilisé)
+    - Triangular : minimum `low`, mode `mode`, maximum `high`
+    """
+    kind: str
+    low: float
+    mode: float
+    high: float
+
+    def sample(self, rng: np.random.Generator, size) -> np.ndarray:
+        if self.high <= self.low:
+            return np.full(size, self.mode)
+        if self.kind == "Normal":
+            return rng.normal((self.low + self.high) / 2, (self.high - self.low) / (2 * _Z90), size)
+        if self.kind == "Triangular":
+            return rng.triangular(self.low, min(max(self.mode, self.low), self.high), self.high, size)
+        raise ValueError(f"Distribution inconnue : {self.kind!r}")
+
+
+@dataclass(frozen=True)
+class MonteCarloResult:
+    """Quantiles (QUANTILES) des tirages, une ligne par quantile."""
+    n_trials: int
+    sales: np.ndarray          # [quantile, month] ventes mensuelles
+    margin_rate: np.ndarray    # [quantile, month] taux de marge cumulé depuis janvier
+    year_end_margin: np.ndarray  # [quantile] taux de marge de fin d'année
+
+
+def _simulate_chunk(dist, base_rev, base_margin, cell_rev, cell_margin, seed, n):
+    """
+    Un bloc de n tirages : croissance G [n, cellules] puis, par produit
+    matriciel, ventes et marge mensuelles = base + G @ contribution des cellules.
+    """
+    rng = np.random.Generator(np.random.PCG64(seed))
+    growth = dist.sample(rng, (n, cell_rev.shape[0]))
+    sales = base_rev + growth @ cell_rev
+    margin = base_margin + growth @ cell_margin
+    ytd_rate = np.cumsum(margin, axis=1) / np.cumsum(sales, axis=1)
+    return sales.astype(np.float32), ytd_rate.astype(np.float32)
+
+
+def simulate(dist: GrowthDistribution, base_rev, base_margin, cell_rev, cell_margin,
+             n_trials: int, seed: int = 0, max_workers: int = MAX_WORKERS) -> MonteCarloResult:
+    """
+    Monte Carlo vectorisé sur la base mensuelle du forecast.
+
+    - base_rev, base_margin   : [month] ventes / marge de base
+    - cell_rev, cell_margin   : [cellule, month] contribution des cellules
+                                soumises à la croissance aléatoire
+    Les tirages sont découpés en blocs de CHUNK_SIZE, chacun avec son flux
+    RNG issu de SeedSequence(seed) : même graine, mêmes résultats. Au-delà
+    de PARALLEL_THRESHOLD tirages, les blocs tournent dans un pool de processus.
+    """
+    sizes = [CHUNK_SIZE] * (n_trials // CHUNK_SIZE)
+    if n_trials % CHUNK_SIZE:
+        sizes.append(n_trials % CHUNK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(dist, base_rev, base_margin, cell_rev, cell_margin, s, n) for s, n in zip(seeds, sizes)]
+
+    if n_trials > PARALLEL_THRESHOLD and len(sizes) > 1:
+        # spawn : pas de fork d'un serveur multi-threadé
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context("spawn")) as pool:
+            chunks = list(pool.map(_simulate_chunk, *zip(*args)))
+    else:
+        chunks = [_simulate_chunk(*a) for a in args]
+
+    sales = np.concatenate([c[0] for c in chunks])
+    ytd_rate = np.concatenate([c[1] for c in chunks])
+    return MonteCarloResult(
+        n_trials=n_trials,
+        sales=np.quantile(sales, QUANTILES, axis=0),
+        margin_rate=np.quantile(ytd_rate, QUANTILES, axis=0),
+        year_end_margin=np.quantile(ytd_rate[:, -1], QUANTILES),
+    )
+
+
+if __name__ == "__main__":
+    # Contrôle : python montecarlo.py — les P10 / P90 empiriques d'un grand
+    # échantillon de la loi normale retombent sur ses bornes, quel que soit le mode
+    rng = np.random.default_rng(0)
+    for low, mode, high in [(0.0, 0.02, 0.04), (0.0, 0.035, 0.04), (-0.05, -0.04, 0.10)]:
+        dist = GrowthDistribution("Normal", low, mode, high)
+        p10, p90 = np.quantile(dist.sample(rng, 1_000_000), (0.1, 0.9))
+        tol = 0.005 * (high - low)
+        assert abs(p10 - low) < tol and abs(p90 - high) < tol, (dist, p10, p90)
+        print(f"Normal [{low:+.3f}, {high:+.3f}] mode {mode:+.3f} : P10 {p10:+.4f}  P90 {p90:+.4f}")
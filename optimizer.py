@@ -0,0 +1,154 @@
+# optimizer.py
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from datastore import load_dataset, query
+from memory import tracked_cache
+from tracing import traced
+
+# Grain de l'allocation : une cellule par Country × Category × Subcategory
+CELL_DIMENSIONS = ["Country", "Category", "Subcategory"]
+OBJECTIVES = ["Margin", "Margin rate"]
+
+FORECAST_CELLS_SQL = """
+    SELECT Country, Category, Subcategory, Period,
+           SUM(Volume)                AS Volume,
+           SUM(Volume * "Unit Price") AS Revenue,
+           SUM(Volume * "Unit Cost")  AS Cost
+    FROM Fact
+    WHERE Scenario = 'Forecast'
+      AND Period >= 202501
+      AND Period <  202601
+    GROUP BY Country, Category, Subcategory, Period
+"""
+
+
+@dataclass(frozen=True)
+class Allocation:
+    """Volume additionnel par cellule et courbes mensuelles qui en résultent."""
+    volume: np.ndarray          # [cell] volume additionnel
+    growth: np.ndarray          # [cell] croissance relative du volume de la cellule
+    base_revenue: np.ndarray    # [month]
+    base_margin: np.ndarray     # [month]
+    revenue: np.ndarray         # [month] après allocation
+    margin: np.ndarray          # [month] après allocation
+    iterations: int             # itérations de Dinkelbach (1 pour la marge)
+
+
+def _greedy(score: np.ndarray, caps: np.ndarray, budget: float) -> np.ndarray:
+    """
+    Sac à dos fractionnaire : max Σ score·x  s.c.  Σ x ≤ budget, 0 ≤ x ≤ caps.
+    Solution exacte du LP : remplir les cellules par score décroissant (score
+    > 0 uniquement) jusqu'à épuisement du budget. Tri + cumsum, sans boucle.
+    """
+    order = np.argsort(-score, kind="stable")
+    order = order[score[order] > 0]
+    filled_before = np.cumsum(caps[order]) - caps[order]
+    x = np.zeros_like(caps)
+    x[order] = np.clip(budget - filled_before, 0, caps[order])
+    return x
+
+
+@dataclass(frozen=True)
+class ReallocationModel:
+    """
+    Volume, Revenue et Cost du forecast par cellule (Country × Category ×
+    Subcategory) et par mois. Un volume additionnel x_c se répartit sur les
+    mois au prorata du volume de la cellule : il rapporte p_c·x_c de ventes et
+    u_c·x_c de marge (prix et marge unitaires moyens de la cellule).
+    """
+    cells: pd.DataFrame         # clés CELL_DIMENSIONS
+    months: pd.DatetimeIndex
+    volume: np.ndarray          # [cell]
+    revenue: np.ndarray         # [cell, month]
+    cost: np.ndarray            # [cell, month]
+
+    @property
+    def unit_price(self) -> np.ndarray:
+        return self.revenue.sum(axis=1) / self.volume
+
+    @property
+    def unit_margin(self) -> np.ndarray:
+        return (self.revenue - self.cost).sum(axis=1) / self.volume
+
+    @traced("aggregate:optimizer.solve")
+    def solve(self, budget: float, caps, objective: str = "Margin",
+              max_iter: int = 50, tol: float = 1e-12) -> Allocation:
+        """
+        Alloue `budget` unités de volume additionnel, au plus `caps[c]` par
+        cellule, pour maximiser la marge brute ou le taux de marge total.
+
+        Le taux de marge (M0 + u·x) / (R0 + p·x) est un objectif
+        linéaire-fractionnaire : la méthode de Dinkelbach le ramène à une
+        suite de LP  max (u - λ·p)·x, chacun résolu par _greedy, avec λ mis
+        à jour au taux obtenu jusqu'à stabilisation.
+        """
+        caps = np.clip(np.asarray(caps, dtype=float), 0, None)
+        price, unit_margin = self.unit_price, self.unit_margin
+
+        if objective == "Margin":
+            x, iterations = _greedy(unit_margin, caps, budget), 1
+        elif objective == "Margin rate":
+            base_rev = self.revenue.sum()
+            base_margin = base_rev - self.cost.sum()
+            rate = base_margin / base_rev
+            x = np.zeros_like(caps)
+            for iterations in range(1, max_iter + 1):
+                x = _greedy(unit_margin - rate * price, caps, budget)
+                new_rate = (base_margin + unit_margin @ x) / (base_rev + price @ x)
+                if new_rate - rate <= tol:
+                    break
+                rate = new_rate
+        else:
+            raise ValueError(f"Objectif inconnu : {objective!r}")
+
+        growth = x / self.volume
+        base_revenue = self.revenue.sum(axis=0)
+        base_margin = base_revenue - self.cost.sum(axis=0)
+        return Allocation(
+            volume=x,
+            growth=growth,
+            base_revenue=base_revenue,
+            base_margin=base_margin,
+            revenue=base_revenue + growth @ self.revenue,
+            margin=base_margin + growth @ (self.revenue - self.cost),
+            iterations=iterations,
+        )
+
+
+@traced("aggregate:build_model")
+def build_model(df: pd.DataFrame) -> ReallocationModel:
+    """Tenseurs cellule × mois à partir des agrégats du forecast."""
+    cell_codes, cells = pd.MultiIndex.from_frame(df[CELL_DIMENSIONS].astype(str)).factorize(sort=True)
+    month_codes, months = pd.factorize(df["Period"], sort=True)
+
+    shape = (len(cells), len(months))
+    flat = np.ravel_multi_index((cell_codes, month_codes), shape)
+    size = int(np.prod(shape))
+    revenue = np.bincount(flat, weights=df["Revenue"].to_numpy(dtype=float), minlength=size)
+    cost = np.bincount(flat, weights=df["Cost"].to_numpy(dtype=float), minlength=size)
+    volume = np.bincount(cell_codes, weights=df["Volume"].to_numpy(dtype=float), minlength=len(cells))
+
+    keep = volume > 0
+    return ReallocationModel(
+        cells=pd.DataFrame(list(cells[keep]), columns=CELL_DIMENSIONS),
+        months=pd.to_datetime(months.astype(str), format="%Y%m"),
+        volume=volume[keep],
+        revenue=revenue.reshape(shape)[keep],
+        cost=cost.reshape(shape)[keep],
+    )
+
+
+@tracked_cache("optimizer")
+@st.cache_resource(show_spinner="Préparation de l'optimiseur…")
+def _model_for_version(version: str) -> ReallocationModel:
+    return build_model(query(FORECAST_CELLS_SQL))
+
+
+def load_model() -> ReallocationModel:
+    """Modèle d'allocation du Forecast 2025, construit une fois par version des données."""
+    return _model_for_version(load_dataset().version)
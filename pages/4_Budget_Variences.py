@@ -1,105 +1,114 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
-import plotly.graph_objects as go
-import visuals
 from utils import show_logo
+from datastore import load_dataset, query
+from memory import freeze, tracked_cache
+from cube import grouping_sets
+from figcache import cached_figure
+from datatable import paginated_table
+from tracing import finish_page, plotly_chart, start_page
 
 st.set_page_config(page_title="…", layout="wide")
+start_page(__file__)
 
 # Affiche le logo cliquable, centré
 show_logo(width=1200)
 
 st.title("2025: Waterfall Analysis - Budget vs Forecast (Relative)")
 
+# Waterfall levels, computed together with the grand total as grouping sets
+WATERFALL_LEVELS = [('Category',), ('Subcategory',), ('Client',), ('Segment',)]
+
+@tracked_cache("page:variance_levels")
 @st.cache_resource
-def get_connection():
-    return sqlite3.connect(':memory:', check_same_thread=False)
+def load_variance_levels(version):
+    """
+    Budget vs Forecast 2025 at Category×Subcategory×Client×Segment grain
+    (in-process SQL over the shared dataset), plus every waterfall level and
+    the grand total rolled up in one pass. Cached per data version and shared
+    read-only by all sessions.
+    """
+    df_detail = query(
+        """
+        SELECT f.Category,
+               f.Subcategory,
+               f.Client,
+               d.Segment,
+               SUM(CASE WHEN f.Scenario='Budget' THEN f.Revenue ELSE 0 END) AS Budget,
+               SUM(CASE WHEN f.Scenario='Forecast' THEN f.Revenue ELSE 0 END) AS Forecast
+        FROM Fact f
+        LEFT JOIN DimClient d ON f.Client=d.Client
+        WHERE f.Period >= 202501 AND f.Period < 202601
+          AND f.Scenario IN ('Budget','Forecast')
+        GROUP BY f.Category, f.Subcategory, f.Client, d.Segment
+        """
+    )
+    levels = grouping_sets(df_detail, WATERFALL_LEVELS + [()], ['Budget', 'Forecast'])
+    # Deltas for the detailed table, computed once per data version
+    df_detail['Delta'] = df_detail['Forecast'] - df_detail['Budget']
+    df_detail['Pct Change'] = df_detail['Delta'] / df_detail['Budget']
+    return freeze(df_detail), {k: freeze(v) for k, v in levels.items()}
 
-@st.cache_data
-def load_data(_conn):
-    # Load fact table into in-memory SQLite
-    df = pd.read_excel("./Data/df_fact.xlsx")
-    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-    df['Date'] = pd.to_datetime(df['Date'])
-    df['Revenue'] = (df['Volume'] * df['Unit Price']).round(0).astype(int)
-    df.to_sql('Fact', _conn, index=False, if_exists='replace')
-    # Load client dimension
-    dim = pd.read_excel("./Data/final_client_dimension.xlsx")
-    dim = dim.rename(columns={'Client Segment':'Segment'})[['Client','Segment']]
-    dim.to_sql('DimClient', _conn, index=False, if_exists='replace')
+df_all, levels = load_variance_levels(load_dataset().version)
 
-# Initialize database connection and load data
-conn = get_connection()
-load_data(conn)
+# Grand total
+total = levels[()].iloc[0]
+col1, col2, col3 = st.columns(3)
+col1.metric("Budget 2025", f"€{total['Budget']:,.0f}")
+col2.metric("Forecast 2025", f"€{total['Forecast']:,.0f}")
+col3.metric("Δ Forecast vs Budget", f"€{total['Forecast'] - total['Budget']:,.0f}",
+            delta=f"{total['Forecast'] / total['Budget'] - 1:+.1%}")
 
-# Query Budget vs Forecast data for 2025
-df_all = pd.read_sql_query(
-    """
-    SELECT f.Category,
-           f.Subcategory,
-           f.Client,
-           d.Segment,
-           SUM(CASE WHEN f.Scenario='Budget' THEN f.Volume * f.[Unit Price] ELSE 0 END) AS Budget,
-           SUM(CASE WHEN f.Scenario='Forecast' THEN f.Volume * f.[Unit Price] ELSE 0 END) AS Forecast
-    FROM Fact f
-    LEFT JOIN DimClient d ON f.Client=d.Client
-    WHERE f.Date >= '2025-01-01' AND f.Date < '2026-01-01'
-      AND f.Scenario IN ('Budget','Forecast')
-    GROUP BY f.Category, f.Subcategory, f.Client, d.Segment
-    """,
-    conn
-)
-
-# Function to plot relative waterfall
-def plot_relative_waterfall(df, group_col, title):
-    df_grp = df.groupby(group_col)[['Budget','Forecast']].sum()
-    impacts = (df_grp['Forecast'] - df_grp['Budget']).sort_values(ascending=False)
-    fig = go.Figure(go.Waterfall(
-        x=impacts.index.tolist(),
-        y=impacts.tolist(),
-        measure=['relative'] * len(impacts),
-        connector={'line':{'color':'rgb(63,63,63)'}}
-    ))
-    fig.update_layout(
-        title=f'Relative Impact: Budget→Forecast by {title}',
-        yaxis_title='Δ Revenue (€)',
-        waterfallgap=0.4
-    )
-    st.plotly_chart(fig)
+# Function to plot relative waterfall from a precomputed level
+# (served from the figure cache while the data version is unchanged)
+def plot_relative_waterfall(group_col, title):
+    def build():
+        import plotly.graph_objects as go  # deferred: only needed on a figure-cache miss
+        df_grp = levels[(group_col,)].set_index(group_col)
+        impacts = (df_grp['Forecast'] - df_grp['Budget']).sort_values(ascending=False)
+        fig = go.Figure(go.Waterfall(
+            x=impacts.index.tolist(),
+            y=impacts.tolist(),
+            measure=['relative'] * len(impacts),
+            connector={'line':{'color':'rgb(63,63,63)'}}
+        ))
+        fig.update_layout(
+            title=f'Relative Impact: Budget→Forecast by {title}',
+            yaxis_title='Δ Revenue (€)',
+            waterfallgap=0.4
+        )
+        return fig
+    plotly_chart(cached_figure('budget_variances', f'waterfall_{group_col}', {}, build))
 
 # Plot waterfall analyses
 st.subheader("By Category")
-plot_relative_waterfall(df_all, 'Category', 'Category')
+plot_relative_waterfall('Category', 'Category')
 
 st.subheader("By Subcategory")
-plot_relative_waterfall(df_all, 'Subcategory', 'Subcategory')
+plot_relative_waterfall('Subcategory', 'Subcategory')
 
 st.subheader("By Client")
-plot_relative_waterfall(df_all, 'Client', 'Client')
+plot_relative_waterfall('Client', 'Client')
 
 st.subheader("By Client Segment")
-plot_relative_waterfall(df_all, 'Segment', 'Client Segment')
+plot_relative_waterfall('Segment', 'Client Segment')
 
 # --- Detailed table with conditional formatting ---
 st.subheader("Detailed Budget vs Forecast Table")
-# Compute deltas and percentages
-df_table = df_all.copy()
-df_table['Delta'] = df_table['Forecast'] - df_table['Budget']
-df_table['Pct Change'] = df_table['Delta'] / df_table['Budget']
-
-# Style with conditional formatting
-dstyled = (
-    df_table
-    .style
-    .format({
+# Sorted, filtered and paginated server-side: only the visible page is
+# formatted, coloured (vectorized sign masks) and sent to the browser
+paginated_table(
+    df_all,
+    key='variance_table',
+    formats={
         'Budget': '€{0:,.0f}',
         'Forecast': '€{0:,.0f}',
         'Delta': '€{0:,.0f}',
         'Pct Change': '{0:.1%}'
-    })
-    .applymap(lambda v: 'color: green' if isinstance(v, (int, float)) and v > 0 else 'color: red', subset=['Delta', 'Pct Change'])
+    },
+    colored=['Delta', 'Pct Change'],
+    filter_cols=['Category', 'Segment'],
+    search_cols=['Subcategory', 'Client'],
 )
 
-# Display styled table
-st.write(dstyled)
+finish_page()
@@ -1,49 +1,36 @@
 import streamlit as st
-import sqlite3
-import pandas as pd
-import plotly.graph_objects as go
-import visuals  # initialise votre template “green‑blue blend”
+import numpy as np
 from utils import show_logo
+from scenario import BASES, load_engine, run_monte_carlo
+from montecarlo import DISTRIBUTIONS, GrowthDistribution
+from figcache import cached_figure
+from timeseries import fit_traces
+from tracing import finish_page, plotly_chart, start_page
 
 st.set_page_config(page_title="…", layout="wide")
+start_page(__file__)
 
 # Affiche le logo cliquable, centré
 show_logo(width=1200)
 
 st.title("2025 Forecast End-of-Year Analysis")
 
-# 1) Connexion et chargement
-@st.cache_resource
-def get_connection():
-    return sqlite3.connect(':memory:', check_same_thread=False)
-
-@st.cache_data
-def load_data(_conn):
-    df = pd.read_excel("./Data/df_fact.xlsx")
-    df = df.loc[:, ~df.columns.str.contains(r'^Unnamed')]
-    df['Date']    = pd.to_datetime(df['Date'])
-    df['Revenue'] = df['Volume'] * df['Unit Price']
-    df['Cost']    = df['Volume'] * df['Unit Cost']
-    df.to_sql("Fact", _conn, index=False, if_exists="replace")
-
-conn = get_connection()
-load_data(conn)
-
-# 2) Charger les données Forecast 2025
-df_fc = pd.read_sql_query("""
-    SELECT Date, Country, Category, Volume, [Unit Price], [Unit Cost]
-    FROM Fact
-    WHERE Scenario = 'Forecast'
-      AND Date >= '2025-01-01'
-      AND Date <  '2026-01-01'
-""", conn)
-df_fc['Date'] = pd.to_datetime(df_fc['Date'])
-
-# 3) Contrôles de filtre
+# 1) Moteur de scénario 2025 : Revenue / Cost précalculés par
+#    (Country, Category, Month), construit une fois par version des données,
+#    sur le forecast chargé ou sur la prévision des modèles statistiques
 st.sidebar.header("Assumptions")
+base = st.sidebar.selectbox(
+    "Base de prévision",
+    BASES,
+    help="Forecast : fichier chargé. Statistical : seasonal naive / Holt-Winters "
+         "ajustés par pays × catégorie × client sur le réalisé."
+)
+engine = load_engine(base)
+
+# 2) Contrôles de filtre
 
 # — Sélection multiple de pays (tout sélectionné par défaut)
-countries = sorted(df_fc['Country'].unique())
+countries = engine.countries
 selected_countries = st.sidebar.multiselect(
     "Pays",
     options=countries,
@@ -51,19 +38,13 @@ selected_countries = st.sidebar.multiselect(
 )
 
 # — Sélection multiple de catégories (tout sélectionné par défaut)
-categories = sorted(df_fc['Category'].unique())
+categories = engine.categories
 selected_categories = st.sidebar.multiselect(
     "Catégories",
     options=categories,
     default=categories
 )
 
-# — Choix du scénario
-scenario = st.sidebar.selectbox(
-    "Scénario",
-    ["Central", "Optimistic", "Pessimistic"]
-)
-
 # — Taux de croissance (%) de 0 % à 5 %
 growth_pct = st.sidebar.slider(
     "Taux de croissance (%)",
@@ -72,90 +53,237 @@ growth_pct = st.sidebar.slider(
 )
 growth = growth_pct / 100.0
 
-# 4) Déterminer le facteur à appliquer
-if scenario == "Optimistic":
-    factor = 1 + growth
-elif scenario == "Pessimistic":
-    factor = 1 - growth
-else:
-    factor = 1.0
-
-# 5) Appliquer le filtre pays/catégorie et ajuster
-df_base = df_fc.copy()
-df_scen = df_fc.copy()
-
-mask = (
-    df_scen['Country'].isin(selected_countries) &
-    df_scen['Category'].isin(selected_categories)
-)
-df_scen.loc[mask, 'Volume'] *= factor
-
-# 6) Recalculer Revenue & Cost
-for d in (df_base, df_scen):
-    d['Revenue'] = d['Volume'] * d['Unit Price']
-    d['Cost']    = d['Volume'] * d['Unit Cost']
-
-# 7) Agrégation mensuelle
-monthly_base = (
-    df_base
-    .groupby(pd.Grouper(key='Date', freq='M'))
-    .agg(Revenue=('Revenue','sum'))
-    .reset_index()
-)
-monthly_scen = (
-    df_scen
-    .groupby(pd.Grouper(key='Date', freq='M'))
-    .agg(Revenue=('Revenue','sum'))
-    .reset_index()
-)
+# — Mode Monte Carlo : croissance aléatoire par pays × catégorie, entre les
+#   bornes ci-dessous (mode de la loi triangulaire = taux ci-dessus)
+monte_carlo = st.sidebar.checkbox("Monte Carlo")
+if monte_carlo:
+    mc_kind = st.sidebar.selectbox(
+        "Loi de croissance", DISTRIBUTIONS,
+        help="Normal : bornes = P10 / P90, centrée sur leur milieu. Triangular : bornes = min / max, mode = taux de croissance."
+    )
+    mc_low, mc_high = st.sidebar.slider(
+        "Bornes de croissance (%)",
+        min_value=-5.0, max_value=10.0, value=(0.0, 4.0), step=0.1,
+        format="%.1f%%"
+    )
+    mc_trials = st.sidebar.select_slider(
+        "Tirages",
+        options=[10_000, 100_000, 1_000_000],
+        value=100_000,
+        format_func=lambda n: f"{n:,}"
+    )
+    mc_seed = st.sidebar.number_input("Graine", min_value=0, value=0, step=1)
+
+# 3) Base de la sélection (facteur 1) : commune au graphique de scénario,
+#    au Monte Carlo et aux marges de référence
+baseline = engine.evaluate(selected_countries, selected_categories, 1.0)
 
-# 8) Filtrer la période d'affichage (04/2025 à 01/2026)
+# 4) Filtrer la période d'affichage (04/2025 à 01/2026)
 start, end = "2025-04-01", "2026-01-31"
-monthly_base = monthly_base[
-    (monthly_base['Date'] >= start) & (monthly_base['Date'] <= end)
-]
-monthly_scen = monthly_scen[
-    (monthly_scen['Date'] >= start) & (monthly_scen['Date'] <= end)
-]
-
-# 9) Graphique comparatif
-fig = go.Figure()
-fig.add_trace(go.Scatter(
-    x=monthly_base['Date'], y=monthly_base['Revenue'],
-    mode='lines+markers', name='Central'
-))
-fig.add_trace(go.Scatter(
-    x=monthly_scen['Date'], y=monthly_scen['Revenue'],
-    mode='lines+markers', name=scenario
-))
-fig.update_layout(
-    title=f"2025 Sales Forecast – {scenario} ({growth_pct:.1f}% on selection)",
-    xaxis_title="Date",
-    yaxis_title="Sales (€)",
-    legend_title="Scénarios"
-)
-st.plotly_chart(fig, use_container_width=True)
-
-# 10) Totaux & marges
-total_base_rev  = df_base['Revenue'].sum()
-total_scen_rev  = df_scen['Revenue'].sum()
-total_base_cost = df_base['Cost'].sum()
-total_scen_cost = df_scen['Cost'].sum()
-
-base_margin = (total_base_rev - total_base_cost) / total_base_rev
-scen_margin = (total_scen_rev - total_scen_cost) / total_scen_rev
-delta_rev_pct    = total_scen_rev / total_base_rev - 1
-delta_margin_pct = scen_margin - base_margin
-
-col1, col2 = st.columns(2)
-col1.metric(
-    label="Total Sales (Scenario)",
-    value=f"€{total_scen_rev:,.0f}",
-    delta=f"{delta_rev_pct:+.1%}".replace("%", "%%")
-)
-col2.metric(
-    label="Margin (Scenario)",
-    value=f"{scen_margin:.1%}".replace("%", "%%"),
-    delta=f"{delta_margin_pct:+.1%}".replace("%", "%%")
+shown = (baseline.months >= start) & (baseline.months <= end)
+months = baseline.months[shown]
+
+base_margin = (baseline.base_total_revenue - baseline.base_total_cost) / baseline.base_total_revenue
+base_margin_ytd = (
+    (baseline.base_revenue - engine.cost.sum(axis=(0, 1))).cumsum() / baseline.base_revenue.cumsum()
 )
 
+# Chaque figure est servie depuis le cache tant que les entrées dont elle
+# dépend (et la version des données) sont inchangées
+PAGE = 'forecast_eoy'
+selection = {'base': base, 'countries': selected_countries, 'categories': selected_categories}
+
+# 5) Scénario : fragment rejoué seul quand le scénario change (seuls la
+#    courbe de scénario et les métriques en dépendent)
+@st.fragment
+def scenario_section():
+    scenario = st.selectbox(
+        "Scénario",
+        ["Central", "Optimistic", "Pessimistic"]
+    )
+
+    # 6) Déterminer le facteur à appliquer
+    if scenario == "Optimistic":
+        factor = 1 + growth
+    elif scenario == "Pessimistic":
+        factor = 1 - growth
+    else:
+        factor = 1.0
+
+    # Évaluer le scénario : base + (facteur - 1) × contribution de la sélection
+    result = engine.evaluate(selected_countries, selected_categories, factor)
+
+    # 7) Graphique comparatif
+    def build_forecast_chart():
+        import plotly.graph_objects as go  # différé : seulement au défaut du cache de figures
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=months, y=result.base_revenue[shown],
+            mode='lines+markers', name='Central'
+        ))
+        fig.add_trace(go.Scatter(
+            x=months, y=result.scen_revenue[shown],
+            mode='lines+markers', name=scenario
+        ))
+        if base != "Forecast":
+            # Forecast chargé en référence, à côté de la prévision statistique
+            loaded = load_engine("Forecast").evaluate(selected_countries, selected_categories, 1.0)
+            fig.add_trace(go.Scatter(
+                x=months, y=loaded.base_revenue[shown],
+                mode='lines', name='Forecast (loaded)', line_dash='dot'
+            ))
+        fig.update_layout(
+            title=f"2025 Sales Forecast – {scenario} ({growth_pct:.1f}% on selection)",
+            xaxis_title="Date",
+            yaxis_title="Sales (€)",
+            legend_title="Scénarios"
+        )
+        # Nombre de points borné (LTTB) et rendu WebGL au-delà du seuil
+        return fit_traces(fig)
+
+    plotly_chart(
+        cached_figure(PAGE, 'forecast', dict(selection, scenario=scenario, growth=growth_pct), build_forecast_chart),
+        use_container_width=True
+    )
+
+    # Totaux & marges
+    total_base_rev  = result.base_total_revenue
+    total_scen_rev  = result.scen_total_revenue
+    total_scen_cost = result.scen_total_cost
+
+    scen_margin = (total_scen_rev - total_scen_cost) / total_scen_rev
+    delta_rev_pct    = total_scen_rev / total_base_rev - 1
+    delta_margin_pct = scen_margin - base_margin
+
+    col1, col2 = st.columns(2)
+    col1.metric(
+        label="Total Sales (Scenario)",
+        value=f"€{total_scen_rev:,.0f}",
+        delta=f"{delta_rev_pct:+.1%}".replace("%", "%%")
+    )
+    col2.metric(
+        label="Margin (Scenario)",
+        value=f"{scen_margin:.1%}".replace("%", "%%"),
+        delta=f"{delta_margin_pct:+.1%}".replace("%", "%%")
+    )
+
+scenario_section()
+
+# 8) Monte Carlo : fan charts P10 / P50 / P90
+def fan_chart(x, quantiles, title, yaxis_title, base=None):
+    import plotly.graph_objects as go
+    p10, p50, p90 = quantiles
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=x, y=p90, mode='lines', line_width=0, name='P90', showlegend=False))
+    fig.add_trace(go.Scatter(
+        x=x, y=p10, mode='lines', line_width=0, name='P10 – P90',
+        fill='tonexty', fillcolor='rgba(107,174,214,0.35)'
+    ))
+    fig.add_trace(go.Scatter(x=x, y=p50, mode='lines+markers', name='P50'))
+    if base is not None:
+        fig.add_trace(go.Scatter(x=x, y=base, mode='lines', name='Central', line_dash='dot'))
+    fig.update_layout(title=title, xaxis_title="Date", yaxis_title=yaxis_title, hovermode="x unified")
+    return fit_traces(fig)
+
+if monte_carlo:
+    st.subheader("Monte Carlo")
+    mc = run_monte_carlo(
+        selected_countries, selected_categories,
+        GrowthDistribution(mc_kind, mc_low / 100, growth, mc_high / 100),
+        n_trials=mc_trials, seed=int(mc_seed), base=base
+    )
+    mc_state = dict(selection, growth=growth_pct, mc=(mc_kind, mc_low, mc_high, mc_trials, int(mc_seed)))
+    plotly_chart(cached_figure(PAGE, 'mc_sales', mc_state, lambda: fan_chart(
+        months, mc.sales[:, shown],
+        f"Monthly Sales – {mc.n_trials:,} trials ({mc_kind})", "Sales (€)",
+        base=baseline.base_revenue[shown]
+    )), use_container_width=True)
+    plotly_chart(cached_figure(PAGE, 'mc_margin', mc_state, lambda: fan_chart(
+        baseline.months, 100 * mc.margin_rate,
+        "Year-to-date Margin rate", "Margin (%)",
+        base=100 * base_margin_ytd
+    )), use_container_width=True)
+
+    col1, col2, col3 = st.columns(3)
+    for col, label, value in zip((col1, col2, col3), ("P10", "P50", "P90"), mc.year_end_margin):
+        col.metric(
+            label=f"Year-end Margin {label}",
+            value=f"{value:.2%}",
+            delta=f"{100 * (value - base_margin):+.2f} pts"
+        )
+
+# 9) Sensibilité : chaque taux de 0 % à 5 % (pas de 0,1) appliqué à chaque
+#    cellule pays × catégorie, évalué en une seule passe vectorisée. Section
+#    sous la ligne de flottaison : calculée seulement une fois dépliée, et
+#    rejouée seule quand la mesure change
+@st.fragment
+def sensitivity_section():
+    st.subheader("Sensitivity by Country × Category")
+    if not st.toggle("Afficher la sensibilité"):
+        return
+    grid = engine.sensitivity(np.linspace(0, 0.05, 51))
+    cells = [f"{c} · {k}" for c in grid.countries for k in grid.categories]
+
+    SENSITIVITY_MEASURES = {
+        "Sales (€)": grid.delta_sales,
+        "Margin (€)": grid.delta_margin,
+        "Margin rate (pts)": grid.delta_margin_rate,
+    }
+    measure = st.radio("Impact", list(SENSITIVITY_MEASURES), horizontal=True)
+
+    def build_sensitivity_heatmap():
+        import plotly.graph_objects as go
+        impact = SENSITIVITY_MEASURES[measure].reshape(len(grid.rates), -1)
+
+        # Cellules triées par impact au taux maximal (les plus sensibles en haut)
+        order = np.argsort(np.abs(impact[-1]))
+        fig_heat = go.Figure(go.Heatmap(
+            x=100 * grid.rates,
+            y=[cells[i] for i in order],
+            z=impact[:, order].T,
+            colorscale="RdBu", zmid=0,
+            colorbar_title=measure,
+            hovertemplate="%{y}<br>Growth %{x:.1f}%<br>Δ %{z:,.2f}<extra></extra>",
+        ))
+        fig_heat.update_layout(
+            title=f"Δ {measure} vs growth rate applied to a single cell",
+            xaxis_title="Growth rate (%)",
+            height=max(400, 22 * len(cells)),
+        )
+        return fig_heat
+
+    plotly_chart(
+        cached_figure(PAGE, 'sensitivity', {'base': base, 'measure': measure}, build_sensitivity_heatmap),
+        use_container_width=True
+    )
+
+    def build_tornado():
+        import plotly.graph_objects as go
+        # Tornado au taux courant : -taux (pessimiste) / +taux (optimiste) par cellule
+        bounds = engine.sensitivity([-growth, growth])
+        down, up = {
+            "Sales (€)": bounds.delta_sales,
+            "Margin (€)": bounds.delta_margin,
+            "Margin rate (pts)": bounds.delta_margin_rate,
+        }[measure].reshape(2, -1)
+        order = np.argsort(np.abs(up - down))
+        fig_tornado = go.Figure([
+            go.Bar(y=[cells[i] for i in order], x=down[order], orientation="h", name=f"-{growth_pct:.1f}%"),
+            go.Bar(y=[cells[i] for i in order], x=up[order], orientation="h", name=f"+{growth_pct:.1f}%"),
+        ])
+        fig_tornado.update_layout(
+            title=f"Tornado – Δ {measure} at ±{growth_pct:.1f}% per cell",
+            barmode="overlay",
+            xaxis_title=f"Δ {measure}",
+            height=max(400, 22 * len(cells)),
+        )
+        return fig_tornado
+
+    plotly_chart(
+        cached_figure(PAGE, 'tornado', {'base': base, 'measure': measure, 'growth': growth_pct}, build_tornado),
+        use_container_width=True
+    )
+
+sensitivity_section()
+
+finish_page()
@@ -0,0 +1,146 @@
+import streamlit as st
+from utils import show_logo
+from optimizer import CELL_DIMENSIONS, OBJECTIVES, load_model
+from figcache import cached_figure
+from tracing import finish_page, plotly_chart, start_page
+
+st.set_page_config(page_title="Reallocation Optimizer", layout="wide")
+start_page(__file__)
+
+# Affiche le logo cliquable, centré
+show_logo(width=1200)
+
+st.title("2025 Growth Reallocation Optimizer")
+
+# 1) Modèle d'allocation : Volume / Revenue / Cost du Forecast 2025 par
+#    Country × Category × Subcategory et par mois, construit une fois
+model = load_model()
+
+# 2) Hypothèses
+st.sidebar.header("Assumptions")
+objective = st.sidebar.selectbox("Objectif", OBJECTIVES)
+budget_pct = st.sidebar.slider(
+    "Budget de croissance volume (%)",
+    min_value=0.0, max_value=10.0, value=3.0, step=0.1,
+    format="%.1f%%",
+    help="Volume additionnel total, en % du volume forecast 2025."
+)
+default_cap_pct = st.sidebar.slider(
+    "Plafond par cellule (%)",
+    min_value=0.0, max_value=50.0, value=10.0, step=0.5,
+    format="%.1f%%",
+    help="Croissance maximale du volume de chaque cellule, modifiable cellule par cellule ci-dessous."
+)
+
+# — Plafonds par cellule (éditables)
+cells = model.cells.assign(
+    **{
+        "Volume": model.volume,
+        "Unit Margin": model.unit_margin,
+        "Margin Rate": model.unit_margin / model.unit_price,
+        "Cap (%)": default_cap_pct,
+    }
+)
+with st.expander("Per-cell caps"):
+    cells = st.data_editor(
+        cells,
+        disabled=CELL_DIMENSIONS + ["Volume", "Unit Margin", "Margin Rate"],
+        column_config={
+            "Volume": st.column_config.NumberColumn(format="%.0f"),
+            "Unit Margin": st.column_config.NumberColumn(format="€%.2f"),
+            "Margin Rate": st.column_config.NumberColumn(format="%.3f"),
+            "Cap (%)": st.column_config.NumberColumn(min_value=0.0, max_value=100.0, step=0.5),
+        },
+        hide_index=True,
+        use_container_width=True,
+        key=f"caps_{default_cap_pct}",
+    )
+
+# 3) Résolution
+budget = budget_pct / 100 * model.volume.sum()
+caps = cells["Cap (%)"].fillna(0).to_numpy() / 100 * model.volume
+allocation = model.solve(budget, caps, objective)
+
+base_rev, base_margin = allocation.base_revenue.sum(), allocation.base_margin.sum()
+opt_rev, opt_margin = allocation.revenue.sum(), allocation.margin.sum()
+
+col1, col2, col3 = st.columns(3)
+col1.metric(
+    "Volume allocated",
+    f"{allocation.volume.sum():,.0f}",
+    delta=f"{allocation.volume.sum() / budget:.0%} of budget" if budget else None,
+    delta_color="off"
+)
+col2.metric(
+    "Gross Margin",
+    f"€{opt_margin:,.0f}",
+    delta=f"€{opt_margin - base_margin:+,.0f}"
+)
+col3.metric(
+    "Margin Rate",
+    f"{opt_margin / opt_rev:.2%}",
+    delta=f"{100 * (opt_margin / opt_rev - base_margin / base_rev):+.2f} pts"
+)
+
+# 4) Courbes mensuelles avant / après allocation, servies depuis le cache
+#    tant que l'objectif, le budget et les plafonds sont inchangés
+PAGE = 'reallocation'
+inputs = {'objective': objective, 'budget': budget_pct, 'caps': tuple(cells["Cap (%)"].fillna(0))}
+
+def curve_chart(title, base, optimized):
+    import plotly.graph_objects as go  # différé : seulement au défaut du cache de figures
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=model.months, y=base, mode='lines+markers', name='Forecast'))
+    fig.add_trace(go.Scatter(x=model.months, y=optimized, mode='lines+markers', name='Optimized'))
+    fig.update_layout(title=f"2025 {title} – {objective} objective", xaxis_title="Date", yaxis_title="€")
+    return fig
+
+plotly_chart(cached_figure(PAGE, 'sales_curve', inputs, lambda: curve_chart(
+    "Monthly Sales", allocation.base_revenue, allocation.revenue
+)), use_container_width=True)
+plotly_chart(cached_figure(PAGE, 'margin_curve', inputs, lambda: curve_chart(
+    "Monthly Gross Margin", allocation.base_margin, allocation.margin
+)), use_container_width=True)
+
+# 5) Allocation par cellule
+result = model.cells.assign(
+    **{
+        "Extra Volume": allocation.volume,
+        "Growth (%)": 100 * allocation.growth,
+        "Δ Revenue": allocation.volume * model.unit_price,
+        "Δ Margin": allocation.volume * model.unit_margin,
+    }
+)
+result = result[result["Extra Volume"] > 0].sort_values("Δ Margin", ascending=False)
+
+st.subheader("Allocation by cell")
+def build_allocation_chart():
+    import plotly.graph_objects as go
+    fig_alloc = go.Figure(go.Bar(
+        x=result["Extra Volume"],
+        y=result[CELL_DIMENSIONS].agg(" · ".join, axis=1),
+        orientation="h",
+        customdata=result["Growth (%)"],
+        hovertemplate="%{y}<br>+%{x:,.0f} units (+%{customdata:.1f}%)<extra></extra>",
+    ))
+    fig_alloc.update_layout(
+        xaxis_title="Extra Volume",
+        yaxis_autorange="reversed",
+        height=max(400, 22 * len(result)),
+    )
+    return fig_alloc
+
+plotly_chart(cached_figure(PAGE, 'allocation', inputs, build_allocation_chart), use_container_width=True)
+st.dataframe(
+    result,
+    column_config={
+        "Extra Volume": st.column_config.NumberColumn(format="%.0f"),
+        "Growth (%)": st.column_config.NumberColumn(format="%.1f%%"),
+        "Δ Revenue": st.column_config.NumberColumn(format="€%.0f"),
+        "Δ Margin": st.column_config.NumberColumn(format="€%.0f"),
+    },
+    hide_index=True,
+    use_container_width=True,
+)
+
+finish_page()
@@ -0,0 +1,104 @@
+import json
+import streamlit as st
+import pandas as pd
+from utils import show_logo
+from memory import MEMORY_ADMIN, get_ledger
+from tracing import finish_page, start_page
+
+st.set_page_config(page_title="Memory Admin", layout="wide")
+start_page(__file__)
+
+# Affiche le logo cliquable, centré
+show_logo(width=1200)
+
+st.title("Memory Accounting")
+
+MB = 1024 * 1024
+ledger = get_ledger()
+
+# 1) Plafond du process, modifiable à chaud (jusqu'au prochain redémarrage).
+#    Il s'applique à toutes les sessions : réservé à FPNA_MEMORY_ADMIN=1
+st.sidebar.header("Plafond")
+
+if MEMORY_ADMIN:
+    def set_budget():
+        ledger.budget_bytes = int(st.session_state["memory_budget_mb"] * MB)
+
+    st.sidebar.number_input(
+        "Plafond mémoire (Mo)", min_value=64, step=64,
+        value=int(ledger.budget_bytes / MB), key="memory_budget_mb", on_change=set_budget,
+    )
+    if st.sidebar.button("Appliquer le plafond maintenant"):
+        freed = ledger.enforce()
+        st.sidebar.success(f"{freed / MB:,.1f} Mo libérés")
+else:
+    st.sidebar.metric("Plafond mémoire", f"{ledger.budget_bytes / MB:,.0f} Mo")
+    st.sidebar.caption("Lecture seule : le plafond et les évictions se pilotent avec FPNA_MEMORY_ADMIN=1.")
+
+# 2) Vue d'ensemble
+report = ledger.report()
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("RSS du process", f"{report['rss_bytes'] / MB:,.0f} Mo")
+c2.metric("Comptabilisé", f"{report['total_bytes'] / MB:,.0f} Mo",
+          f"{report['total_bytes'] / report['budget_bytes']:.0%} du plafond", delta_color="off")
+c3.metric("Non attribué", f"{max(0, report['rss_bytes'] - report['total_bytes']) / MB:,.0f} Mo",
+          help="Interpréteur, bibliothèques, objets non suivis et fragmentation")
+c4.metric("Évictions", f"{report['evictions']['entries']}",
+          f"{report['evictions']['bytes'] / MB:,.1f} Mo", delta_color="off")
+
+mb_column = st.column_config.NumberColumn("Mo", format="%.2f")
+
+# 3) Structures partagées et connexions
+st.subheader("Structures partagées et connexions")
+structures = pd.DataFrame(report["structures"], columns=["name", "kind", "bytes"])
+st.dataframe(
+    structures.assign(Mo=structures["bytes"] / MB).drop(columns="bytes").sort_values("Mo", ascending=False),
+    column_config={"Mo": mb_column}, hide_index=True, use_container_width=True,
+)
+
+# 4) Entrées des caches Streamlit suivis (les moins récemment utilisées sont évincées en premier)
+st.subheader("Entrées de cache")
+entries = pd.DataFrame(report["cache_entries"],
+                       columns=["cache", "key", "bytes", "hits", "pinned", "age_s", "idle_s"])
+st.dataframe(
+    entries.assign(Mo=entries["bytes"] / MB).drop(columns="bytes"),
+    column_config={"Mo": mb_column, "key": st.column_config.TextColumn("key", width="large")},
+    hide_index=True, use_container_width=True,
+)
+
+# 5) Sessions : résultats de requêtes détenus par chaque session
+st.subheader("Sessions")
+sessions = pd.DataFrame(
+    [{"session": s["session"][:8], "label": label, "bytes": n, "idle_s": s["idle_s"]}
+     for s in report["sessions"] for label, n in s["labels"].items()],
+    columns=["session", "label", "bytes", "idle_s"],
+)
+per_session = (
+    sessions.groupby("session", as_index=False)
+    .agg(objets=("label", "size"), bytes=("bytes", "sum"), idle_s=("idle_s", "first"))
+    .sort_values("bytes", ascending=False)
+)
+st.dataframe(
+    per_session.assign(Mo=per_session["bytes"] / MB).drop(columns="bytes"),
+    column_config={"Mo": mb_column}, hide_index=True, use_container_width=True,
+)
+with st.expander("Détail par session"):
+    st.dataframe(
+        sessions.assign(Mo=sessions["bytes"] / MB).drop(columns="bytes"),
+        column_config={"Mo": mb_column}, hide_index=True, use_container_width=True,
+    )
+
+# 6) Export pour le capacity planning
+rows = pd.concat([
+    structures.assign(section="structure", key="").rename(columns={"kind": "detail"}),
+    entries.assign(section="cache_entry", detail="").rename(columns={"cache": "name"}),
+    sessions.assign(section="session").rename(columns={"session": "name", "label": "key"}).assign(detail=""),
+], ignore_index=True)[["section", "name", "key", "detail", "bytes"]]
+
+c1, c2 = st.columns(2)
+c1.download_button("Exporter le rapport (JSON)", json.dumps(report, indent=2),
+                   file_name="memory_report.json", mime="application/json")
+c2.download_button("Exporter le détail (CSV)", rows.to_csv(index=False),
+                   file_name="memory_report.csv", mime="text/csv")
+
+finish_page()
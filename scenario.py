@@ -0,0 +1,272 @@
+# scenario.py
+
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from datastore import CACHE_DIR, load_dataset, query
+from memory import tracked_cache
+from montecarlo import GrowthDistribution, MonteCarloResult, simulate
+from statforecast import FittedModels, fit_models
+from tracing import traced
+
+FORECAST_SQL = """
+    SELECT Date, Country, Category, Volume, "Unit Price", "Unit Cost"
+    FROM Fact
+    WHERE Scenario = 'Forecast'
+      AND Period >= 202501
+      AND Period <  202601
+"""
+
+# Historique des modèles statistiques : réalisé par Country × Category × Client
+ACTUALS_SQL = """
+    SELECT Country, Category, Client, Period,
+           SUM(Revenue) AS Revenue, SUM(Cost) AS Cost
+    FROM Fact
+    WHERE Scenario = 'Actual'
+    GROUP BY Country, Category, Client, Period
+"""
+SERIES_KEYS = ["Country", "Category", "Client"]
+
+# Bases de prévision proposées en page 5 : forecast chargé ou modèles statistiques
+BASES = ["Forecast", "Statistical"]
+
+
+@dataclass(frozen=True)
+class ScenarioResult:
+    """Résultat d'un scénario : séries mensuelles et totaux base / scénario."""
+    months: pd.DatetimeIndex
+    base_revenue: np.ndarray
+    scen_revenue: np.ndarray
+    base_total_revenue: float
+    base_total_cost: float
+    scen_total_revenue: float
+    scen_total_cost: float
+
+
+@dataclass(frozen=True)
+class SensitivityGrid:
+    """
+    Impacts d'une croissance de volume appliquée à une seule cellule
+    Country × Category, pour chaque taux de la grille.
+    Tableaux [taux, country, category].
+    """
+    rates: np.ndarray
+    countries: list
+    categories: list
+    delta_sales: np.ndarray         # Δ ventes totales (€)
+    delta_margin: np.ndarray        # Δ marge brute totale (€)
+    delta_margin_rate: np.ndarray   # Δ taux de marge total (points de %)
+
+
+@dataclass(frozen=True)
+class ScenarioEngine:
+    """
+    Moteur de scénario « croissance de volume sur une sélection ».
+
+    Revenue et Cost sont linéaires en volume : appliquer un facteur f aux
+    volumes d'une sélection pays × catégorie donne
+        scénario = base + (f - 1) × contribution de la sélection.
+    Les tenseurs Revenue / Cost (Country × Category × Month) sont calculés
+    une fois ; chaque interaction coûte O(cellules), sans copie de DataFrame.
+    """
+    countries: list
+    categories: list
+    months: pd.DatetimeIndex      # fins de mois
+    revenue: np.ndarray           # [country, category, month]
+    cost: np.ndarray
+
+    def selection(self, countries, categories) -> np.ndarray:
+        """Masque booléen [country, category] de la sélection."""
+        return np.isin(self.countries, list(countries))[:, None] & np.isin(self.categories, list(categories))[None, :]
+
+    @traced("aggregate:scenario.evaluate")
+    def evaluate(self, countries, categories, factor: float) -> ScenarioResult:
+        sel = self.selection(countries, categories)
+        base_rev = self.revenue.sum(axis=(0, 1))
+        sel_rev = np.einsum("ck,ckm->m", sel, self.revenue)
+        base_cost = self.cost.sum()
+        sel_cost = np.einsum("ck,ckm->", sel, self.cost)
+        scen_rev = base_rev + (factor - 1) * sel_rev
+        return ScenarioResult(
+            months=self.months,
+            base_revenue=base_rev,
+            scen_revenue=scen_rev,
+            base_total_revenue=float(base_rev.sum()),
+            base_total_cost=float(base_cost),
+            scen_total_revenue=float(scen_rev.sum()),
+            scen_total_cost=float(base_cost + (factor - 1) * sel_cost),
+        )
+
+    @traced("aggregate:scenario.sensitivity")
+    def sensitivity(self, rates) -> SensitivityGrid:
+        """
+        Évalue toute une grille de taux de croissance × cellules en une seule
+        opération vectorisée (broadcasting NumPy sur le tenseur annuel).
+        """
+        rates = np.asarray(rates, dtype=float)
+        cell_rev = self.revenue.sum(axis=2)
+        cell_margin = cell_rev - self.cost.sum(axis=2)
+        total_rev = cell_rev.sum()
+        total_margin = cell_margin.sum()
+
+        r = rates[:, None, None]
+        delta_sales = r * cell_rev[None, :, :]
+        delta_margin = r * cell_margin[None, :, :]
+        new_rate = (total_margin + delta_margin) / (total_rev + delta_sales)
+        return SensitivityGrid(
+            rates=rates,
+            countries=self.countries,
+            categories=self.categories,
+            delta_sales=delta_sales,
+            delta_margin=delta_margin,
+            delta_margin_rate=100 * (new_rate - total_margin / total_rev),
+        )
+
+    @traced("aggregate:scenario.monte_carlo")
+    def monte_carlo(self, countries, categories, dist: GrowthDistribution,
+                    n_trials: int, seed: int = 0) -> MonteCarloResult:
+        """
+        Croissance aléatoire tirée selon `dist` pour chaque cellule de la
+        sélection (indépendamment), appliquée à la base mensuelle.
+        """
+        sel = self.selection(countries, categories)
+        margin = self.revenue - self.cost
+        return simulate(
+            dist,
+            base_rev=self.revenue.sum(axis=(0, 1)),
+            base_margin=margin.sum(axis=(0, 1)),
+            cell_rev=self.revenue[sel],
+            cell_margin=margin[sel],
+            n_trials=n_trials,
+            seed=seed,
+        )
+
+
+@traced("aggregate:build_engine")
+def build_engine(df: pd.DataFrame) -> ScenarioEngine:
+    """Tenseurs Country × Category × Month à partir des lignes de forecast."""
+    country_codes, countries = pd.factorize(df["Country"], sort=True)
+    category_codes, categories = pd.factorize(df["Category"], sort=True)
+    month_codes, months = pd.factorize(df["Date"].dt.to_period("M"), sort=True)
+
+    shape = (len(countries), len(categories), len(months))
+    flat = np.ravel_multi_index((country_codes, category_codes, month_codes), shape)
+    size = int(np.prod(shape))
+    if "Revenue" in df:
+        revenue_w, cost_w = df["Revenue"].to_numpy(dtype=float), df["Cost"].to_numpy(dtype=float)
+    else:
+        volume = df["Volume"].to_numpy(dtype=float)
+        revenue_w, cost_w = volume * df["Unit Price"].to_numpy(), volume * df["Unit Cost"].to_numpy()
+    revenue = np.bincount(flat, weights=revenue_w, minlength=size)
+    cost = np.bincount(flat, weights=cost_w, minlength=size)
+
+    return ScenarioEngine(
+        countries=list(countries),
+        categories=list(categories),
+        months=pd.PeriodIndex(months).to_timestamp(how="end").normalize(),
+        revenue=revenue.reshape(shape),
+        cost=cost.reshape(shape),
+    )
+
+
+def _fitted_models(version: str, series: pd.DataFrame) -> FittedModels:
+    """
+    Modèles ajustés sur `series` [série, mois], relus depuis le cache disque
+    de cette version des données s'il existe et porte sur les mêmes séries
+    (clés identiques, dans le même ordre). Sans version, pas de cache disque.
+    """
+    if not version:
+        return fit_models(series.to_numpy())
+
+    path = os.path.join(CACHE_DIR, f"statforecast-{version}.npz")
+    keys = {k: v.to_numpy(dtype=str) for k, v in series.index.to_frame(index=False).items()}
+    if os.path.exists(path):
+        fitted, saved = FittedModels.load(path)
+        if fitted.n_obs == series.shape[1] and all(
+            np.array_equal(saved.get(f"key_{k}"), keys[k]) for k in SERIES_KEYS
+        ):
+            return fitted
+
+    fitted = fit_models(series.to_numpy())
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fitted.save(path, **{f"key_{k}": keys[k] for k in SERIES_KEYS})
+    return fitted
+
+
+@traced("aggregate:statistical_forecast")
+def statistical_forecast(actuals: pd.DataFrame, version: str = "") -> pd.DataFrame:
+    """
+    Scénario « Statistical » de l'année en cours : réalisé des mois clos
+    puis, jusqu'à décembre, la prévision du meilleur modèle (seasonal naive
+    ou Holt-Winters) de chaque série Country × Category × Client. Le coût
+    prévu applique le ratio coût / ventes des 12 derniers mois de la série.
+
+    `version` (version du Dataset dont viennent `actuals`) nomme le cache
+    disque des modèles ajustés ; vide, les modèles sont réajustés à chaque
+    appel.
+    """
+    month = pd.to_datetime(actuals["Period"].astype(str), format="%Y%m").dt.to_period("M")
+    actuals = actuals.assign(Month=month)
+    history = pd.period_range(month.min(), month.max(), freq="M")
+
+    def pivot(measure):
+        return (
+            actuals.pivot_table(index=SERIES_KEYS, columns="Month", values=measure,
+                                aggfunc="sum", fill_value=0, observed=True)
+            .reindex(columns=history, fill_value=0)
+        )
+
+    revenue, cost = pivot("Revenue"), pivot("Cost")
+    fitted = _fitted_models(version, revenue)
+
+    last = history[-1]
+    future = pd.period_range(last + 1, periods=12 - last.month, freq="M")
+    predicted = fitted.forecast(len(future))
+    trailing_rev = revenue.iloc[:, -12:].sum(axis=1).to_numpy()
+    cost_ratio = np.divide(cost.iloc[:, -12:].sum(axis=1).to_numpy(), trailing_rev,
+                           out=np.zeros_like(trailing_rev), where=trailing_rev != 0)
+
+    keys = revenue.index.to_frame(index=False)
+    forecast_rows = keys.loc[keys.index.repeat(len(future))].reset_index(drop=True)
+    forecast_rows["Date"] = np.tile(future.to_timestamp(), len(keys))
+    forecast_rows["Revenue"] = predicted.ravel()
+    forecast_rows["Cost"] = (predicted * cost_ratio[:, None]).ravel()
+
+    closed = actuals[actuals["Month"].dt.year == last.year]
+    closed = closed.assign(Date=closed["Month"].dt.to_timestamp())[forecast_rows.columns]
+    return pd.concat([closed, forecast_rows], ignore_index=True)
+
+
+@tracked_cache("scenario_engine")
+@st.cache_resource(show_spinner="Préparation du moteur de scénario…")
+def _engine_for_version(version: str, base: str = "Forecast") -> ScenarioEngine:
+    if base == "Statistical":
+        return build_engine(statistical_forecast(query(ACTUALS_SQL), version))
+    return build_engine(query(FORECAST_SQL))
+
+
+def load_engine(base: str = "Forecast") -> ScenarioEngine:
+    """
+    Moteur de l'année 2025, construit une fois par version des données :
+    base "Forecast" (fichier chargé) ou "Statistical" (modèles ajustés).
+    """
+    return _engine_for_version(load_dataset().version, base)
+
+
+@tracked_cache("monte_carlo", max_entries=32)
+@st.cache_data(show_spinner="Simulation Monte Carlo…", max_entries=32)
+def _monte_carlo_for_version(version: str, base: str, countries: tuple, categories: tuple,
+                             dist: GrowthDistribution, n_trials: int, seed: int) -> MonteCarloResult:
+    return _engine_for_version(version, base).monte_carlo(countries, categories, dist, n_trials, seed)
+
+
+def run_monte_carlo(countries, categories, dist: GrowthDistribution,
+                    n_trials: int, seed: int = 0, base: str = "Forecast") -> MonteCarloResult:
+    """Monte Carlo mis en cache par base, sélection, loi, nombre de tirages et graine."""
+    return _monte_carlo_for_version(
+        load_dataset().version, base, tuple(countries), tuple(categories), dist, n_trials, seed
+    )
@@ -0,0 +1,223 @@
+# sqlite_store.py
+
+import os
+import queue
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+from datastore import CACHE_DIR, load_dataset
+from memory import get_ledger
+
+POOL_SIZE = int(os.environ.get("FPNA_SQLITE_POOL_SIZE", "4"))
+# Version du schéma : une base construite avec un autre schéma est reconstruite
+SCHEMA_VERSION = "2"
+
+# Dimensions stockées en tables clé entière -> libellé
+DIM_TABLES = {
+    "Scenario": "dim_scenario",
+    "Country": "dim_country",
+    "Category": "dim_category",
+    "Subcategory": "dim_subcategory",
+}
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE dim_scenario    (scenario_key    INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE dim_country     (country_key     INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE dim_category    (category_key    INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE dim_subcategory (subcategory_key INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE dim_client (
+    client_key INTEGER PRIMARY KEY,
+    name       TEXT NOT NULL UNIQUE,
+    segment    TEXT
+);
+CREATE TABLE fact_data (
+    period_key      INTEGER NOT NULL,   -- YYYYMM
+    date_key        INTEGER NOT NULL,   -- YYYYMMDD (date réelle de la ligne)
+    scenario_key    INTEGER NOT NULL REFERENCES dim_scenario,
+    country_key     INTEGER NOT NULL REFERENCES dim_country,
+    category_key    INTEGER NOT NULL REFERENCES dim_category,
+    subcategory_key INTEGER NOT NULL REFERENCES dim_subcategory,
+    client_key      INTEGER NOT NULL REFERENCES dim_client,
+    volume          INTEGER NOT NULL,
+    unit_price      REAL    NOT NULL,
+    unit_cost       REAL    NOT NULL,
+    revenue         REAL    NOT NULL,
+    cost            REAL    NOT NULL,
+    margin          REAL    NOT NULL
+);
+
+-- Filtre Scenario + période (WHERE Scenario='Forecast' AND Period >= …
+-- de la page 5, pivot CASE Budget/Forecast de la page 4, ventes Actual par
+-- pays de la page 1) : index couvrant, la table n'est jamais relue.
+CREATE INDEX ix_fact_scenario_period ON fact_data (
+    scenario_key, period_key, date_key, country_key, category_key, subcategory_key,
+    client_key, revenue, volume, unit_price, unit_cost
+);
+
+-- Vues au format « plat » attendu par le SQL des pages
+CREATE VIEW Fact AS
+SELECT c.name   AS Country,
+       k.name   AS Category,
+       sc.name  AS Subcategory,
+       cl.name  AS Client,
+       cl.segment AS Segment,
+       f.volume AS Volume,
+       f.unit_price AS "Unit Price",
+       f.unit_cost  AS "Unit Cost",
+       printf('%04d-%02d-%02d', f.date_key / 10000, f.date_key / 100 % 100, f.date_key % 100) AS Date,
+       f.period_key AS Period,
+       s.name   AS Scenario,
+       f.revenue AS Revenue,
+       f.cost    AS Cost,
+       f.margin  AS Margin
+FROM fact_data f
+JOIN dim_scenario    s  ON s.scenario_key     = f.scenario_key
+JOIN dim_country     c  ON c.country_key      = f.country_key
+JOIN dim_category    k  ON k.category_key     = f.category_key
+JOIN dim_subcategory sc ON sc.subcategory_key = f.subcategory_key
+JOIN dim_client      cl ON cl.client_key      = f.client_key;
+
+CREATE VIEW DimClient AS
+SELECT name AS Client, segment AS Segment FROM dim_client;
+"""
+
+
+def database_path(version: str) -> str:
+    # Un fichier par version des données et du schéma : une reconstruction
+    # n'écrase jamais une base encore ouverte en lecture par d'autres process.
+    return os.path.join(CACHE_DIR, f"fact-{version}-s{SCHEMA_VERSION}.sqlite")
+
+
+def _database_version(path: str):
+    """Version du Dataset ayant servi à construire la base (schéma courant), ou None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError:
+        return None
+    return meta.get("version") if meta.get("schema") == SCHEMA_VERSION else None
+
+
+def build_database(force: bool = False) -> str:
+    """
+    Écrit la base SQLite fichier (schéma en étoile typé + index) à partir du
+    Dataset partagé. Ne fait rien si la base de la version courante des
+    données existe déjà, sauf si force=True. Renvoie le chemin de la base.
+    """
+    data = load_dataset()
+    path = database_path(data.version)
+    if not force and _database_version(path) == data.version:
+        return path
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    fact = data.fact
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+
+        # Dimensions : clé = code de la catégorie pandas + 1
+        for col, table in DIM_TABLES.items():
+            names = fact[col].cat.categories
+            conn.executemany(
+                f"INSERT INTO {table} VALUES (?, ?)",
+                ((i + 1, str(name)) for i, name in enumerate(names)),
+            )
+        segments = data.clients.set_index("Client")["Segment"]
+        conn.executemany(
+            "INSERT INTO dim_client VALUES (?, ?, ?)",
+            ((i + 1, str(name), segments.get(name))
+             for i, name in enumerate(fact["Client"].cat.categories)),
+        )
+
+        rows = pd.DataFrame({
+            "period_key": fact["Period"],
+            "date_key": (fact["Date"].dt.year * 10000 + fact["Date"].dt.month * 100
+                         + fact["Date"].dt.day),
+            "scenario_key": fact["Scenario"].cat.codes + 1,
+            "country_key": fact["Country"].cat.codes + 1,
+            "category_key": fact["Category"].cat.codes + 1,
+            "subcategory_key": fact["Subcategory"].cat.codes + 1,
+            "client_key": fact["Client"].cat.codes + 1,
+            "volume": fact["Volume"],
+            "unit_price": fact["Unit Price"],
+            "unit_cost": fact["Unit Cost"],
+            "revenue": fact["Revenue"],
+            "cost": fact["Cost"],
+            "margin": fact["Margin"],
+        })
+        rows.to_sql("fact_data", conn, index=False, if_exists="append", chunksize=50_000)
+        conn.executemany("INSERT INTO meta VALUES (?, ?)",
+                         [("version", data.version), ("schema", SCHEMA_VERSION)])
+        conn.commit()
+        conn.execute("ANALYZE")
+        # WAL : lectures concurrentes sans verrou lecteur/écrivain
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+    except BaseException:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, path)
+    return path
+
+
+class ConnectionPool:
+    """Petit pool de connexions SQLite en lecture seule sur la base fichier."""
+
+    def __init__(self, path: str, size: int = POOL_SIZE):
+        self._idle = queue.Queue()
+        self.nbytes = 0   # plafond des caches de pages (sqlite3 n'expose pas l'usage réel)
+        for _ in range(size):
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+            pages = conn.execute("PRAGMA cache_size").fetchone()[0]
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            self.nbytes += -pages * 1024 if pages < 0 else pages * page_size
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+
+@st.cache_resource
+def get_pool(version: str) -> ConnectionPool:
+    # version en argument : un nouveau jeu de données ouvre un nouveau pool
+    build_database()
+    pool = ConnectionPool(database_path(version))
+    get_ledger().add_shared(f"sqlite_pool:{version[:8]}", lambda: pool.nbytes, kind="connection")
+    return pool
+
+
+def query(sql: str, params=None) -> pd.DataFrame:
+    """Exécute une requête sur la base SQLite partagée (Date relue en datetime)."""
+    pool = get_pool(load_dataset().version)
+    with pool.connection() as conn:
+        df = pd.read_sql_query(sql, conn, params=params)
+    if "Date" in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"])
+    return df
+
+
+if __name__ == "__main__":
+    # Étape de build : python sqlite_store.py [--force]
+    print(build_database(force="--force" in sys.argv[1:]))
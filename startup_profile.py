@@ -0,0 +1,99 @@
+# startup_profile.py
+
+import argparse
+import ast
+import glob
+import os
+import subprocess
+import sys
+
+# Budget d'import à froid d'une page, en ms, au-delà de `import streamlit`
+BUDGET_MS = float(os.environ.get("FPNA_STARTUP_BUDGET_MS", "1000"))
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def page_imports(path: str) -> str:
+    """Instructions d'import de niveau module du script (le reste n'est pas exécuté)."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    return "\n".join(
+        ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))
+    )
+
+
+def import_profile(code: str) -> dict:
+    """
+    Exécute `code` dans un interpréteur neuf avec -X importtime et renvoie le
+    coût cumulé (µs) de chaque module importé au premier niveau.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR, capture_output=True, text=True,
+        env=dict(os.environ, PYTHONPATH=APP_DIR, PYTHONDONTWRITEBYTECODE="1"),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    costs = {}
+    started = False
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Modules de premier niveau (nom sans indentation supplémentaire),
+        # à partir de streamlit : le démarrage de l'interpréteur (site…) est exclu
+        if name.startswith("  ") or not cumulative.strip().isdigit():
+            continue
+        started = started or name.strip() == "streamlit"
+        if started:
+            costs[name.strip()] = costs.get(name.strip(), 0) + int(cumulative)
+    return costs
+
+
+def profile(path: str, repeat: int = 3):
+    """
+    Coût d'import à froid des dépendances de `path`, hors `import streamlit`
+    (commun à toutes les pages) : meilleur de `repeat` essais, en ms, avec le
+    détail par module de premier niveau de l'essai retenu.
+    """
+    best = None
+    for _ in range(repeat):
+        costs = import_profile("import streamlit\n" + page_imports(path))
+        baseline = costs.pop("streamlit", 0)
+        total = sum(costs.values())
+        if best is None or total < best[0]:
+            best = (total, baseline, costs)
+    total, baseline, costs = best
+    return total / 1000, baseline / 1000, {k: v / 1000 for k, v in costs.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Coût d'import à froid de chaque page ; code de sortie 1 au-delà du budget."
+    )
+    parser.add_argument("scripts", nargs="*", help="scripts à profiler (défaut : Home.py et pages/*.py)")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS,
+                        help="budget par page, hors import de streamlit (FPNA_STARTUP_BUDGET_MS)")
+    parser.add_argument("--repeat", type=int, default=3, help="essais par page (le meilleur est retenu)")
+    parser.add_argument("--top", type=int, default=5, help="modules les plus coûteux affichés par page")
+    args = parser.parse_args(argv)
+
+    scripts = args.scripts or ["Home.py"] + sorted(glob.glob("pages/*.py", root_dir=APP_DIR))
+    over = []
+    for script in scripts:
+        total, baseline, costs = profile(os.path.join(APP_DIR, script), args.repeat)
+        flag = "OVER" if total > args.budget_ms else "ok"
+        print(f"{script:40s} {total:8.1f} ms  (streamlit {baseline:.0f} ms)  {flag}")
+        for name, ms in sorted(costs.items(), key=lambda kv: -kv[1])[:args.top]:
+            print(f"    {name:36s} {ms:8.1f} ms")
+        if total > args.budget_ms:
+            over.append(script)
+
+    if over:
+        print(f"\nBudget de {args.budget_ms:.0f} ms dépassé : {', '.join(over)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
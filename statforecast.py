@@ -0,0 +1,142 @@
+# statforecast.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from multiprocessing import get_context
+
+import numpy as np
+
+# Comme montecarlo.py, module limité à NumPy : les processus du pool
+# l'importent sans charger Streamlit ni les données.
+
+SEASON = 12
+MODELS = ["Seasonal naive", "Holt-Winters"]
+# Grille des paramètres de lissage Holt-Winters (niveau, tendance, saisonnalité)
+ALPHAS = (0.1, 0.2, 0.3, 0.5, 0.7, 0.9)
+BETAS = (0.0, 0.05, 0.1, 0.2)
+GAMMAS = (0.0, 0.1, 0.3, 0.5)
+# Séries par bloc ; au-delà de PARALLEL_THRESHOLD séries, les blocs sont
+# ajustés dans un pool de processus
+CHUNK_SERIES = 2_000
+PARALLEL_THRESHOLD = int(os.environ.get("FPNA_FIT_PARALLEL_THRESHOLD", 4_000))
+MAX_WORKERS = int(os.environ.get("FPNA_FIT_WORKERS", 0)) or None
+
+
+@dataclass(frozen=True)
+class FittedModels:
+    """
+    Modèles ajustés, une ligne par série.
+
+    - model              : indice dans MODELS retenu pour la série (plus
+                           faible erreur sur les points après la 1re saison)
+    - alpha, beta, gamma : paramètres Holt-Winters additif retenus
+    - level, trend, season : état Holt-Winters en fin d'historique
+                           (season indexée par position calendaire t % 12)
+    - tail               : 12 dernières observations (seasonal naive)
+    - sse                : erreur quadratique du modèle retenu
+    - n_obs              : nombre de points d'historique
+    """
+    model: np.ndarray
+    alpha: np.ndarray
+    beta: np.ndarray
+    gamma: np.ndarray
+    level: np.ndarray
+    trend: np.ndarray
+    season: np.ndarray
+    tail: np.ndarray
+    sse: np.ndarray
+    n_obs: int
+
+    def forecast(self, horizon: int) -> np.ndarray:
+        """Prévisions [série, horizon] des `horizon` mois suivant l'historique."""
+        h = np.arange(1, horizon + 1)
+        t = self.n_obs - 1 + h
+        holt = self.level[:, None] + h * self.trend[:, None] + self.season[:, t % SEASON]
+        naive = self.tail[:, (h - 1) % SEASON]
+        return np.clip(np.where(self.model[:, None] == 0, naive, holt), 0, None)
+
+    def save(self, path: str, **extra):
+        """Écrit les paramètres (et des tableaux `extra`, ex. clés) en .npz, atomiquement."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **asdict(self), **extra)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """Relit un fichier de save() : (FittedModels, {nom: tableau extra})."""
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {k: data[k] for k in data.files}
+        fields = {k: arrays.pop(k) for k in cls.__dataclass_fields__}
+        fields["n_obs"] = int(fields["n_obs"])
+        return cls(**fields), arrays
+
+
+def _fit_chunk(Y: np.ndarray) -> FittedModels:
+    """
+    Ajuste un bloc de séries [série, mois]. La récursion Holt-Winters est
+    vectorisée sur (grille de paramètres × séries) : un pas de temps = une
+    opération NumPy pour toutes les combinaisons.
+    """
+    n_series, n_obs = Y.shape
+    alpha, beta, gamma = (g.ravel()[:, None] for g in np.meshgrid(ALPHAS, BETAS, GAMMAS, indexing="ij"))
+    n_grid = alpha.shape[0]
+
+    # Initialisation sur la première saison
+    level = np.broadcast_to(Y[:, :SEASON].mean(axis=1), (n_grid, n_series)).copy()
+    trend = np.zeros((n_grid, n_series))
+    season = np.broadcast_to(Y[:, :SEASON] - level[0][:, None], (n_grid, n_series, SEASON)).copy()
+    sse = np.zeros((n_grid, n_series))
+
+    for t in range(SEASON, n_obs):
+        s = t % SEASON
+        y = Y[:, t]
+        err = y - (level + trend + season[:, :, s])
+        sse += err ** 2
+        new_level = alpha * (y - season[:, :, s]) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        season[:, :, s] = gamma * (y - new_level) + (1 - gamma) * season[:, :, s]
+        level = new_level
+
+    best = np.argmin(sse, axis=0)
+    cols = np.arange(n_series)
+    hw_sse = sse[best, cols]
+    naive_sse = ((Y[:, SEASON:] - Y[:, :-SEASON]) ** 2).sum(axis=1)
+    return FittedModels(
+        model=np.where(naive_sse <= hw_sse, 0, 1),
+        alpha=alpha[best, 0],
+        beta=beta[best, 0],
+        gamma=gamma[best, 0],
+        level=level[best, cols],
+        trend=trend[best, cols],
+        season=season[best, cols],
+        tail=Y[:, -SEASON:].copy(),
+        sse=np.minimum(naive_sse, hw_sse),
+        n_obs=n_obs,
+    )
+
+
+def fit_models(Y: np.ndarray, max_workers: int = MAX_WORKERS) -> FittedModels:
+    """
+    Ajuste seasonal naive et Holt-Winters additif (ETS A,A,A) sur chaque
+    série mensuelle de Y [série, mois] et retient le meilleur par série.
+    L'historique doit couvrir plus d'une saison (> 12 mois).
+    """
+    Y = np.asarray(Y, dtype=float)
+    if Y.shape[1] <= SEASON:
+        raise ValueError(f"Historique trop court : {Y.shape[1]} mois (> {SEASON} requis)")
+
+    blocks = [Y[i:i + CHUNK_SERIES] for i in range(0, len(Y), CHUNK_SERIES)] or [Y]
+    if len(Y) > PARALLEL_THRESHOLD and len(blocks) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context("spawn")) as pool:
+            fitted = list(pool.map(_fit_chunk, blocks))
+    else:
+        fitted = [_fit_chunk(b) for b in blocks]
+
+    if len(fitted) == 1:
+        return fitted[0]
+    return FittedModels(**{
+        k: (fitted[0].n_obs if k == "n_obs" else np.concatenate([getattr(f, k) for f in fitted]))
+        for k in FittedModels.__dataclass_fields__
+    })
@@ -0,0 +1,348 @@
+# synthetic.py
+
+import argparse
+import math
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+
+import numpy as np
+import pandas as pd
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Sortie par défaut (hors dépôt, à côté du cache Arrow)
+OUTPUT_DIR = os.path.join(APP_DIR, ".cache", "synthetic")
+# Lignes de faits générées par tâche (une tâche = un row group Parquet)
+CHUNK_ROWS = int(os.environ.get("FPNA_SYNTH_CHUNK_ROWS", "1000000"))
+MAX_WORKERS = int(os.environ.get("FPNA_SYNTH_WORKERS", str(os.cpu_count() or 1)))
+
+SCENARIOS = ["Actual", "Budget", "Forecast"]
+COUNTRIES = ["France", "Italy", "Spain", "Germany", "Portugal", "Belgium",
+             "Netherlands", "Switzerland", "Austria", "Poland", "Greece", "Ireland"]
+# Catégories -> sous-catégories des données de démonstration
+CATALOGUE = {
+    "Beverages": ["Soda", "Juice", "Water"],
+    "Dry Goods": ["Pasta", "Rice", "Canned Food"],
+    "Fresh Products": ["Meat", "Dairy", "Vegetables"],
+    "Frozen": ["Ice Cream", "Frozen Pizza", "Frozen Veggies"],
+}
+# Attributs de la dimension client, avec les fréquences de client_dimension.csv
+SEGMENTS = {"Indépendant": 0.45, "GMS": 0.25, "HORECA": 0.30}
+REGIONS = {"West": 0.40, "North": 0.25, "South": 0.15, "East": 0.20}
+CLUSTERS = {"Small": 0.35, "Mid-tier": 0.35, "Premium": 0.30}
+CLIENTS_PER_MANAGER = 4
+
+# Distributions observées dans df_fact.xlsx
+PRICE_RANGE = (1.5, 6.0)         # Unit Price uniforme, en euros
+COST_RATIO = (0.50, 0.85)        # Unit Cost / Unit Price uniforme
+VOLUME_LEVEL = 122.0             # volume mensuel moyen par ligne
+SEASONALITY = 0.20               # amplitude relative (pic en avril, creux en octobre)
+VOLUME_NOISE = 0.09              # bruit relatif du réalisé et du plan
+PLAN_NOISE = 0.04                # écart relatif Budget / Forecast autour du plan
+
+
+@dataclass(frozen=True)
+class GeneratorConfig:
+    """
+    Paramètres du jeu synthétique. Les valeurs par défaut reproduisent la
+    forme des données de démonstration (28 080 lignes) :
+
+    - Actual couvre les années avant la dernière et ses `actual_months`
+      premiers mois (mois clôturés) ;
+    - Budget et Forecast couvrent la dernière année ; le Forecast reprend
+      le réalisé des mois clôturés.
+    """
+    countries: int = 3
+    clients: int = 20
+    subcategories: int = 12
+    start_year: int = 2024
+    years: int = 2
+    grain: str = "month"          # "month" (1er du mois) ou "day"
+    actual_months: int = 3
+    scenarios: tuple = tuple(SCENARIOS)
+    seed: int = 0
+
+    def __post_init__(self):
+        if self.grain not in ("month", "day"):
+            raise ValueError(f"grain inconnu : {self.grain}")
+        if not 0 <= self.actual_months <= 12:
+            raise ValueError("actual_months doit être entre 0 et 12")
+        unknown = set(self.scenarios) - set(SCENARIOS)
+        if unknown or not self.scenarios:
+            raise ValueError(f"scénarios invalides : {sorted(unknown) or '(aucun)'}")
+        if min(self.countries, self.clients, self.subcategories, self.years) < 1:
+            raise ValueError("countries, clients, subcategories et years doivent être >= 1")
+
+    @property
+    def final_year(self) -> int:
+        return self.start_year + self.years - 1
+
+    @property
+    def units(self) -> int:
+        """Couples (pays, client) : l'unité de découpage en tâches."""
+        return self.countries * self.clients
+
+    def unit_rows(self) -> int:
+        """Lignes de faits par couple (pays, client)."""
+        masks = scenario_masks(self, dates(self))
+        return self.subcategories * sum(int(masks[s].sum()) for s in self.scenarios)
+
+    @property
+    def rows(self) -> int:
+        return self.units * self.unit_rows()
+
+
+def config_for_rows(n_rows: int, **params) -> GeneratorConfig:
+    """Configuration dont le nombre de clients donne au moins `n_rows` lignes."""
+    cfg = GeneratorConfig(**params)
+    per_client = cfg.countries * cfg.unit_rows()
+    return replace(cfg, clients=max(1, math.ceil(n_rows / per_client)))
+
+
+# --- Dimensions ---------------------------------------------------------------
+
+def country_names(cfg: GeneratorConfig) -> list:
+    return [COUNTRIES[i] if i < len(COUNTRIES) else f"Country_{i + 1}" for i in range(cfg.countries)]
+
+
+def product_names(cfg: GeneratorConfig):
+    """(sous-catégories, catégorie de chaque sous-catégorie), réparties entre les catégories."""
+    categories = list(CATALOGUE)
+    subcategories, parents = [], []
+    for i in range(cfg.subcategories):
+        category = categories[i % len(categories)]
+        known = CATALOGUE[category]
+        rank = i // len(categories)
+        subcategories.append(known[rank] if rank < len(known) else f"{category} {rank + 1}")
+        parents.append(category)
+    return subcategories, parents
+
+
+def client_names(cfg: GeneratorConfig) -> np.ndarray:
+    return np.array([f"Client_{i + 1}" for i in range(cfg.clients)], dtype=object)
+
+
+def client_dimension(cfg: GeneratorConfig) -> pd.DataFrame:
+    """Dimension client au format de Data/client_dimension.csv."""
+    rng = np.random.default_rng([cfg.seed, 0])
+
+    def draw(weights: dict):
+        return rng.choice(list(weights), size=cfg.clients, p=list(weights.values()))
+
+    return pd.DataFrame({
+        "Client": client_names(cfg),
+        "Client Segment": draw(SEGMENTS),
+        "Client Region": draw(REGIONS),
+        "Client Cluster": draw(CLUSTERS),
+        "Account Manager": [
+            f"Manager_{i % max(1, math.ceil(cfg.clients / CLIENTS_PER_MANAGER)) + 1}"
+            for i in range(cfg.clients)
+        ],
+        "Join Year": rng.integers(cfg.start_year - 6, cfg.start_year, size=cfg.clients),
+    })
+
+
+# --- Table de faits -----------------------------------------------------------
+
+def dates(cfg: GeneratorConfig) -> pd.DatetimeIndex:
+    return pd.date_range(f"{cfg.start_year}-01-01", f"{cfg.final_year}-12-31",
+                         freq="D" if cfg.grain == "day" else "MS")
+
+
+def scenario_masks(cfg: GeneratorConfig, index: pd.DatetimeIndex) -> dict:
+    """Dates couvertes par chaque scénario (tableaux booléens alignés sur `index`)."""
+    final = np.asarray(index.year == cfg.final_year)
+    closed = ~final | np.asarray(index.month <= cfg.actual_months)
+    return {"Actual": closed, "Budget": final, "Forecast": final}
+
+
+def _seasonal_level(cfg: GeneratorConfig, index: pd.DatetimeIndex) -> np.ndarray:
+    """Volume moyen par ligne et par date : saisonnalité sinusoïdale, répartie par jour au grain « day »."""
+    days = np.asarray(index.days_in_month, dtype=float)
+    month = np.asarray(index.month - 1, dtype=float)
+    if cfg.grain == "day":
+        month += (np.asarray(index.day) - 1) / days
+    level = VOLUME_LEVEL * (1 + SEASONALITY * np.sin(2 * np.pi * month / 12))
+    return level / days if cfg.grain == "day" else level
+
+
+def _dictionary(codes: np.ndarray, names):
+    import pyarrow as pa
+    return pa.DictionaryArray.from_arrays(pa.array(codes, pa.int32()), pa.array(list(names), pa.string()))
+
+
+def generate_chunk(cfg: GeneratorConfig, task: int, first_unit: int, last_unit: int):
+    """
+    Lignes des couples (pays, client) d'indices [first_unit, last_unit), en
+    table Arrow (dimensions encodées en dictionnaire). Le tirage ne dépend
+    que de (seed, task) : même sortie quel que soit le nombre de workers.
+    """
+    import pyarrow as pa
+
+    rng = np.random.default_rng([cfg.seed, 1, task])
+    index = dates(cfg)
+    masks = scenario_masks(cfg, index)
+    units = np.arange(first_unit, last_unit)
+    shape = (len(index), len(units), cfg.subcategories)
+
+    # Prix et coûts communs aux scénarios pour une même clé et une même date
+    price = rng.uniform(*PRICE_RANGE, shape).round(2)
+    cost = (price * rng.uniform(*COST_RATIO, shape)).round(2)
+    level = _seasonal_level(cfg, index)[:, None, None]
+    actual = level * (1 + rng.normal(0, VOLUME_NOISE, shape))
+    plan = level * (1 + rng.normal(0, VOLUME_NOISE, shape))
+    volumes = {
+        "Actual": actual,
+        "Budget": plan * (1 + rng.normal(0, PLAN_NOISE, shape)),
+        "Forecast": np.where(masks["Actual"][:, None, None], actual,
+                             plan * (1 + rng.normal(0, PLAN_NOISE, shape))),
+    }
+    min_volume = 0 if cfg.grain == "day" else 1
+
+    date_idx, unit_idx, sub_idx, scen_idx, vol, prices, costs = ([] for _ in range(7))
+    for s, scenario in enumerate(SCENARIOS):
+        if scenario not in cfg.scenarios:
+            continue
+        sel = np.flatnonzero(masks[scenario])
+        per_date = len(units) * cfg.subcategories
+        date_idx.append(np.repeat(sel, per_date))
+        unit_idx.append(np.tile(np.repeat(np.arange(len(units)), cfg.subcategories), len(sel)))
+        sub_idx.append(np.tile(np.arange(cfg.subcategories), len(sel) * len(units)))
+        scen_idx.append(np.full(len(sel) * per_date, s))
+        vol.append(volumes[scenario][sel].ravel())
+        prices.append(price[sel].ravel())
+        costs.append(cost[sel].ravel())
+
+    date_idx, unit_idx, sub_idx = (np.concatenate(a) for a in (date_idx, unit_idx, sub_idx))
+    unit = units[unit_idx]
+    client = unit % cfg.clients
+    offset = int(client.min())
+    subcategories, parents = product_names(cfg)
+    categories = list(dict.fromkeys(parents))
+    parent_code = np.array([categories.index(p) for p in parents])
+
+    return pa.table({
+        "Country": _dictionary(unit // cfg.clients, country_names(cfg)),
+        "Category": _dictionary(parent_code[sub_idx], categories),
+        "Subcategory": _dictionary(sub_idx, subcategories),
+        "Client": _dictionary(client - offset, client_names(cfg)[offset:int(client.max()) + 1]),
+        "Volume": np.maximum(min_volume, np.rint(np.concatenate(vol))).astype("int64"),
+        "Unit Price": np.concatenate(prices),
+        "Unit Cost": np.concatenate(costs),
+        "Date": pa.array(index.values[date_idx].astype("datetime64[ns]")),
+        "Scenario": _dictionary(np.concatenate(scen_idx), SCENARIOS),
+    })
+
+
+def _tasks(cfg: GeneratorConfig, chunk_rows: int):
+    per_task = max(1, chunk_rows // cfg.unit_rows())
+    for task, first in enumerate(range(0, cfg.units, per_task)):
+        yield task, first, min(first + per_task, cfg.units)
+
+
+def generate(cfg: GeneratorConfig, fact_path: str, clients_path: str,
+             workers: int = MAX_WORKERS, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Écrit la table de faits (Parquet, un row group par tâche) et la
+    dimension client (.csv ou .parquet selon l'extension).
+
+    Les tâches tournent dans un pool de processus (spawn) ; au plus deux
+    tâches par worker sont en vol et le process parent écrit les tables dans
+    l'ordre, au fil de l'eau : la mémoire reste bornée quel que soit le
+    nombre de lignes. Écritures atomiques (fichier temporaire + os.replace).
+    """
+    import pyarrow.parquet as pq
+
+    t0 = time.perf_counter()
+    for path in (fact_path, clients_path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    clients = client_dimension(cfg)
+    tmp_path = f"{clients_path}.{os.getpid()}.tmp"
+    if clients_path.endswith(".parquet"):
+        clients.to_parquet(tmp_path, index=False)
+    else:
+        clients.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, clients_path)
+
+    tmp_path = f"{fact_path}.{os.getpid()}.tmp"
+    writer = None
+    rows = 0
+
+    def write(table):
+        nonlocal writer, rows
+        if writer is None:
+            writer = pq.ParquetWriter(tmp_path, table.schema)
+        writer.write_table(table)
+        rows += table.num_rows
+
+    tasks = _tasks(cfg, chunk_rows)
+    try:
+        if workers <= 1:
+            for task in tasks:
+                write(generate_chunk(cfg, *task))
+        else:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(workers, mp_context=context) as pool:
+                pending = deque(pool.submit(generate_chunk, cfg, *task)
+                                for _, task in zip(range(2 * workers), tasks))
+                while pending:
+                    write(pending.popleft().result())
+                    task = next(tasks, None)
+                    if task is not None:
+                        pending.append(pool.submit(generate_chunk, cfg, *task))
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, fact_path)
+    return {"rows": rows, "clients": cfg.clients, "seconds": time.perf_counter() - t0}
+
+
+def main(argv=None):
+    defaults = GeneratorConfig()
+    parser = argparse.ArgumentParser(
+        description="Génère une table de faits synthétique (schéma de df_fact) et sa dimension client."
+    )
+    parser.add_argument("--rows", type=int, help="nombre de lignes visé (ajuste le nombre de clients)")
+    parser.add_argument("--countries", type=int, default=defaults.countries)
+    parser.add_argument("--clients", type=int, default=defaults.clients)
+    parser.add_argument("--subcategories", type=int, default=defaults.subcategories)
+    parser.add_argument("--start-year", type=int, default=defaults.start_year)
+    parser.add_argument("--years", type=int, default=defaults.years)
+    parser.add_argument("--grain", choices=["month", "day"], default=defaults.grain)
+    parser.add_argument("--actual-months", type=int, default=defaults.actual_months,
+                        help="mois clôturés (Actual) de la dernière année")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(defaults.scenarios))
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--fact-path", default=os.path.join(OUTPUT_DIR, "df_fact.parquet"))
+    parser.add_argument("--client-path", default=os.path.join(OUTPUT_DIR, "client_dimension.csv"))
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="processus générateurs")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="lignes par tâche / row group")
+    args = parser.parse_args(argv)
+
+    params = dict(
+        countries=args.countries, clients=args.clients, subcategories=args.subcategories,
+        start_year=args.start_year, years=args.years, grain=args.grain,
+        actual_months=args.actual_months, scenarios=tuple(args.scenarios), seed=args.seed,
+    )
+    if args.rows:
+        params.pop("clients")
+        cfg = config_for_rows(args.rows, **params)
+    else:
+        cfg = GeneratorConfig(**params)
+
+    print(f"{cfg.rows:,} lignes ({cfg.countries} pays × {cfg.clients} clients × "
+          f"{cfg.subcategories} sous-catégories, grain {cfg.grain})", flush=True)
+    stats = generate(cfg, args.fact_path, args.client_path, args.workers, args.chunk_rows)
+    print(f"{stats['rows']:,} lignes écrites en {stats['seconds']:.1f} s "
+          f"({stats['rows'] / stats['seconds']:,.0f} lignes/s)")
+    print(f"FPNA_FACT_PATH={args.fact_path} FPNA_CLIENT_DIM_PATH={args.client_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+# timeseries.py
+
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Au-delà de MAX_POINTS points, une trace est sous-échantillonnée côté serveur
+MAX_POINTS = int(os.environ.get("FPNA_MAX_POINTS", "2000"))
+# Au-delà de WEBGL_THRESHOLD points affichés dans une figure, les traces
+# passent en Scattergl (rendu WebGL au lieu d'un nœud SVG par marqueur)
+WEBGL_THRESHOLD = int(os.environ.get("FPNA_WEBGL_THRESHOLD", "5000"))
+
+# Attributs « un élément par point » à découper avec x / y
+_PER_POINT = ("customdata", "text", "hovertext")
+
+
+def _numeric_x(x) -> np.ndarray:
+    """Abscisses en float (dates en ns, catégories par position)."""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.number):
+        return x.astype(float)
+    try:
+        return pd.to_datetime(x).asi8.astype(float)
+    except (TypeError, ValueError):
+        return np.arange(len(x), dtype=float)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets : indices de `n_out` points qui
+    préservent la forme visuelle de la courbe (premier et dernier inclus).
+    Une itération par bucket, vectorisée à l'intérieur du bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        nxt_start, nxt_end = end, (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x = x[nxt_start:max(nxt_end, nxt_start + 1)].mean()
+        avg_y = y[nxt_start:max(nxt_end, nxt_start + 1)].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Min-max : pour chaque bucket, les indices du minimum et du maximum (les
+    pics sont toujours conservés). Entièrement vectorisé.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    n_buckets = n_out // 2
+    bucket = (np.arange(n) * n_buckets) // n
+    order = np.lexsort((np.nan_to_num(y, nan=np.inf), bucket))
+    starts = np.searchsorted(bucket[order], np.arange(n_buckets))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def fit_traces(fig: "go.Figure", window=None, max_points: int = MAX_POINTS,
+               webgl_threshold: int = WEBGL_THRESHOLD, method: str = "lttb") -> "go.Figure":
+    """
+    Borne le nombre de points envoyés au navigateur pour les traces scatter :
+    restriction à la fenêtre `window` (début, fin) si elle est donnée,
+    sous-échantillonnage (LTTB ou min-max) au-delà de `max_points` points par
+    trace, puis passage en Scattergl si la figure dépasse `webgl_threshold`
+    points au total (y compris quand aucune trace n'est découpée, ex.
+    nombreuses petites traces). Une figure déjà assez petite est renvoyée
+    telle quelle.
+    """
+    traces = {id(t) for t in fig.data if t.type in ("scatter", "scattergl") and t.x is not None}
+    if window is None and all(len(t.x) <= max_points for t in fig.data if id(t) in traces):
+        # Rien à découper : seul le mode de rendu dépend du total de points
+        use_gl = sum(len(t.x) for t in fig.data if id(t) in traces) > webgl_threshold
+        if all(t.type == ("scattergl" if use_gl else "scatter") for t in fig.data if id(t) in traces):
+            return fig
+        return _set_render_mode(fig, [t.to_plotly_json() for t in fig.data], use_gl)
+
+    new_data = []
+    for trace in fig.data:
+        spec = trace.to_plotly_json()
+        if id(trace) not in traces:
+            new_data.append(spec)
+            continue
+        xn = _numeric_x(trace.x)
+        keep = np.arange(len(xn))
+        if window is not None:
+            lo, hi = _numeric_x(list(window))
+            inside = np.flatnonzero((xn >= lo) & (xn <= hi))
+            if len(inside):
+                # un point de part et d'autre pour que la courbe touche les bords
+                keep = np.arange(max(inside[0] - 1, 0), min(inside[-1] + 2, len(xn)))
+        if len(keep) > max_points:
+            y = np.asarray(trace.y, dtype=float)[keep]
+            sub = lttb(xn[keep], y, max_points) if method == "lttb" else minmax(y, max_points)
+            keep = keep[sub]
+        for attr in ("x", "y") + _PER_POINT:
+            values = spec.get(attr)
+            if values is not None and not isinstance(values, str) and len(values) == len(xn):
+                spec[attr] = np.asarray(values)[keep]
+        new_data.append(spec)
+
+    shown = sum(len(d["x"]) for d in new_data if d.get("type") in ("scatter", "scattergl") and d.get("x") is not None)
+    return _set_render_mode(fig, new_data, shown > webgl_threshold)
+
+
+def _set_render_mode(fig: "go.Figure", specs: list, use_gl: bool) -> "go.Figure":
+    """Remplace les traces de `fig` par `specs`, scatter en Scattergl si `use_gl`."""
+    fig.data = []
+    for spec in specs:
+        if spec.get("type") in ("scatter", "scattergl"):
+            spec = dict(spec, type="scattergl" if use_gl else "scatter")
+        fig.add_trace(spec)
+    return fig
+
+
+def date_window(label: str, dates, threshold: int = MAX_POINTS, key: str = None):
+    """
+    Curseur de période affiché seulement quand la série dépasse `threshold`
+    points : renvoie (début, fin) à passer à fit_traces, ou None. Réduire la
+    fenêtre augmente la résolution (le budget de points porte sur la fenêtre).
+    """
+    dates = pd.to_datetime(pd.Series(dates))
+    if len(dates) <= threshold:
+        return None
+    lo, hi = dates.min().to_pydatetime(), dates.max().to_pydatetime()
+    start, end = st.slider(label, min_value=lo, max_value=hi, value=(lo, hi), format="YYYY-MM-DD", key=key)
+    return (start, end) if (start, end) != (lo, hi) else None
@@ -0,0 +1,284 @@
+# tracing.py
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from functools import wraps
+
+import streamlit as st
+
+# Trace les reruns de toutes les sessions : logs JSON + fichier Prometheus
+TRACE = os.environ.get("FPNA_TRACE", "0") == "1"
+# Logs JSON (une ligne par rerun) : fichier, ou stderr si vide
+TRACE_LOG = os.environ.get("FPNA_TRACE_LOG", "")
+# Histogrammes au format texte Prometheus (vide = pas d'export fichier)
+METRICS_FILE = os.environ.get("FPNA_METRICS_FILE", "./.cache/metrics.prom")
+# Le fichier de métriques est réécrit au plus toutes les METRICS_INTERVAL_S secondes
+METRICS_INTERVAL_S = float(os.environ.get("FPNA_METRICS_INTERVAL_S", "10"))
+# Bornes des histogrammes de latence, en secondes
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Paramètre d'URL qui active le panneau de debug de la session (?debug=1)
+DEBUG_PARAM = "debug"
+
+# Étapes d'un rerun (préfixe du nom de span avant « : »)
+STAGES = ("load_data", "query", "aggregate", "figure", "plotly_chart", "table")
+
+logger = logging.getLogger("fpna.trace")
+if TRACE and not logger.handlers:
+    _handler = logging.FileHandler(TRACE_LOG) if TRACE_LOG else logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# Rerun en cours du thread de script (None = pas de traçage : spans sans effet)
+_local = threading.local()
+_NOOP = nullcontext()
+
+
+@dataclass(frozen=True)
+class Span:
+    """Étape chronométrée d'un rerun (temps en secondes, début relatif au rerun)."""
+    name: str
+    start: float
+    seconds: float
+    self_seconds: float     # hors spans imbriqués
+    depth: int
+    attrs: dict = field(default_factory=dict)
+
+    @property
+    def stage(self) -> str:
+        return self.name.split(":", 1)[0]
+
+
+class Run:
+    """Spans d'un rerun de page, dans l'ordre de démarrage."""
+
+    def __init__(self, page: str, debug: bool = False):
+        self.page = page
+        self.debug = debug
+        self.timestamp = time.time()
+        self.seconds = None
+        self.spans = []
+        self._t0 = time.perf_counter()
+        self._children = []   # pile : durée cumulée des spans enfants
+
+    @contextmanager
+    def span(self, name: str, attrs: dict):
+        index = len(self.spans)
+        self.spans.append(None)  # réservé : ordre de démarrage
+        self._children.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            seconds = time.perf_counter() - start
+            children = self._children.pop()
+            if self._children:
+                self._children[-1] += seconds
+            self.spans[index] = Span(name, start - self._t0, seconds, seconds - children,
+                                     len(self._children), attrs)
+
+    def close(self):
+        self.seconds = time.perf_counter() - self._t0
+
+    def stages(self) -> dict:
+        """Temps propre cumulé par étape (les étapes imbriquées ne sont pas comptées deux fois)."""
+        totals = dict.fromkeys(STAGES, 0.0)
+        for s in self.spans:
+            if s is not None:
+                totals[s.stage] = totals.get(s.stage, 0.0) + s.self_seconds
+        return totals
+
+    def to_dict(self) -> dict:
+        return {
+            "page": self.page,
+            "ts": round(self.timestamp, 3),
+            "seconds": round(self.seconds, 6),
+            "stages": {k: round(v, 6) for k, v in self.stages().items()},
+            "spans": [
+                {"name": s.name, "start": round(s.start, 6), "seconds": round(s.seconds, 6),
+                 "depth": s.depth, **s.attrs}
+                for s in self.spans if s is not None
+            ],
+        }
+
+
+def span(name: str, **attrs):
+    """
+    Context manager chronométrant `name` dans le rerun en cours ; il
+    renvoie le dictionnaire d'attributs du span, complétable en cours de
+    route. Hors traçage, renvoie un context manager vide partagé, qui
+    renvoie None (coût : une lecture d'attribut de thread-local).
+    """
+    run = getattr(_local, "run", None)
+    if run is None:
+        return _NOOP
+    return run.span(name, attrs)
+
+
+def traced(name: str):
+    """Décorateur : chaque appel de la fonction est un span `name`."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            run = getattr(_local, "run", None)
+            if run is None:
+                return func(*args, **kwargs)
+            with run.span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def plotly_chart(fig, **kwargs):
+    """st.plotly_chart dans un span (sérialisation de la figure comprise)."""
+    with span("plotly_chart"):
+        return st.plotly_chart(fig, **kwargs)
+
+
+# --- Métriques du process -----------------------------------------------------
+
+class Histogram:
+    """Histogramme cumulable au format Prometheus, par jeu de labels."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.series = {}   # labels (tuple trié) -> [compte par borne…, +Inf, somme]
+
+    def observe(self, labels: dict, value: float):
+        row = self.series.setdefault(tuple(sorted(labels.items())), [0] * (len(self.buckets) + 1) + [0.0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                row[i] += 1
+                break
+        else:
+            row[len(self.buckets)] += 1
+        row[-1] += value
+
+    def lines(self, name: str):
+        for labels, row in sorted(self.series.items()):
+            base = ",".join(f'{k}="{v}"' for k, v in labels)
+            cumulative = 0
+            for bound, n in zip(list(self.buckets) + ["+Inf"], row[:-1]):
+                cumulative += n
+                yield f'{name}_bucket{{{base},le="{bound}"}} {cumulative}'
+            yield f"{name}_sum{{{base}}} {row[-1]:.6f}"
+            yield f"{name}_count{{{base}}} {cumulative}"
+
+
+class Metrics:
+    """Latence des reruns par page et temps propre par étape, partagés par les sessions."""
+
+    def __init__(self):
+        self.reruns = Histogram()
+        self.stages = Histogram()
+        self.last = {}          # page -> dernier Run terminé
+        self._written = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, run: Run):
+        with self._lock:
+            self.reruns.observe({"page": run.page}, run.seconds)
+            for stage, seconds in run.stages().items():
+                self.stages.observe({"page": run.page, "stage": stage}, seconds)
+            self.last[run.page] = run
+
+    def prometheus(self) -> str:
+        with self._lock:
+            lines = [
+                "# HELP fpna_page_rerun_seconds Durée d'un rerun complet de page.",
+                "# TYPE fpna_page_rerun_seconds histogram",
+                *self.reruns.lines("fpna_page_rerun_seconds"),
+                "# HELP fpna_stage_seconds Temps propre d'une étape pendant un rerun.",
+                "# TYPE fpna_stage_seconds histogram",
+                *self.stages.lines("fpna_stage_seconds"),
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str, force: bool = False):
+        """Réécrit `path` (atomique), au plus toutes les METRICS_INTERVAL_S secondes sauf `force`."""
+        now = time.monotonic()
+        if not path or (not force and now - self._written < METRICS_INTERVAL_S):
+            return
+        self._written = now
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, path)
+
+
+@st.cache_resource
+def get_metrics() -> Metrics:
+    """Métriques de traçage du process."""
+    return Metrics()
+
+
+# --- Cycle d'un rerun de page -------------------------------------------------
+
+def _debug_requested() -> bool:
+    """Panneau de debug demandé par la session (?debug=1, mémorisé entre les pages)."""
+    value = st.query_params.get(DEBUG_PARAM)
+    if value is not None:
+        st.session_state["_trace_debug"] = value not in ("", "0", "false")
+    return st.session_state.get("_trace_debug", False)
+
+
+def start_page(script_path: str):
+    """
+    Début du rerun de la page `script_path` (à appeler juste après
+    st.set_page_config). Un rerun interrompu (st.stop, exception) n'est
+    pas compté. Les reruns partiels d'un st.fragment ne sont pas tracés.
+    """
+    debug = _debug_requested()
+    page = os.path.splitext(os.path.basename(script_path))[0]
+    _local.run = Run(page, debug) if TRACE or debug else None
+
+
+def finish_page():
+    """Fin du rerun : export (FPNA_TRACE=1) puis panneau de debug de la session."""
+    run = getattr(_local, "run", None)
+    _local.run = None
+    if run is None:
+        return
+    run.close()
+    if TRACE:
+        metrics = get_metrics()
+        metrics.observe(run)
+        logger.info(json.dumps(run.to_dict()))
+        metrics.write(METRICS_FILE)
+    if run.debug:
+        debug_panel(run)
+
+
+def debug_panel(run: Run):
+    """Détail du rerun dans la barre latérale : temps par étape et arbre des spans."""
+    import pandas as pd
+
+    with st.sidebar.expander(f"⏱ Debug · rerun en {run.seconds * 1000:.0f} ms", expanded=True):
+        stages = run.stages()
+        stages["other"] = max(0.0, run.seconds - sum(stages.values()))
+        st.dataframe(
+            pd.DataFrame({"Étape": list(stages), "ms": [v * 1000 for v in stages.values()]}),
+            column_config={"ms": st.column_config.NumberColumn(format="%.1f")},
+            hide_index=True, use_container_width=True,
+        )
+        spans = [s for s in run.spans if s is not None]
+        st.dataframe(
+            pd.DataFrame({
+                "Span": ["· " * s.depth + s.name for s in spans],
+                "Début (ms)": [s.start * 1000 for s in spans],
+                "Durée (ms)": [s.seconds * 1000 for s in spans],
+                "Propre (ms)": [s.self_seconds * 1000 for s in spans],
+                "Détails": [", ".join(f"{k}={v}" for k, v in s.attrs.items()) for s in spans],
+            }),
+            column_config={c: st.column_config.NumberColumn(format="%.1f")
+                           for c in ("Début (ms)", "Durée (ms)", "Propre (ms)")},
+            hide_index=True, use_container_width=True,
+        )
+        st.caption("Temps propre : hors spans imbriqués. Désactiver avec ?debug=0.")
@@ -1,26 +1,64 @@
 # utils.py
 
 import streamlit as st
-from PIL import Image
-from io import BytesIO
-import base64
+import hashlib
+import os
 
-def show_logo(width: int = 150):
+LOGO_PATH = "images/logo.webp"
+# Répertoire servi par Streamlit sous app/static/ ([server] enableStaticServing)
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+
+@st.cache_resource(show_spinner=False)
+def _logo_src(width: int, mtime_ns: int) -> str:
     """
-    Affiche et centre le logo (images/logo.webp) ;
-    lorsqu’on clique dessus, on revient à la home page ("/").
+    Source <img> du logo pour une largeur d'affichage, calculée une fois par
+    process : image réduite à `width` px (jamais agrandie) et encodée en WEBP.
+
+    Si le service de fichiers statiques est actif, l'image est écrite dans
+    static/ sous un nom qui contient son empreinte (le navigateur la garde en
+    cache, l'URL change avec le contenu) ; sinon on renvoie une data URI.
+    `mtime_ns` invalide le cache quand le fichier source change.
     """
-    # 1) Charge et encode l’image
-    img = Image.open("images/logo.webp")
+    # Imports différés : Pillow n'est chargé qu'au premier encodage du process
+    import base64
+    from io import BytesIO
+    from PIL import Image
+
+    img = Image.open(LOGO_PATH)
+    if img.width > width:
+        img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
     buf = BytesIO()
     img.save(buf, format="WEBP")
-    b64 = base64.b64encode(buf.getvalue()).decode()
+    data = buf.getvalue()
+
+    if st.get_option("server.enableStaticServing"):
+        name = f"logo-{width}-{hashlib.sha256(data).hexdigest()[:12]}.webp"
+        path = os.path.join(STATIC_DIR, name)
+        if not os.path.exists(path):
+            os.makedirs(STATIC_DIR, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return f"app/static/{name}"
+
+    return "data:image/webp;base64," + base64.b64encode(data).decode()
+
+
+def show_logo(width: int = 150):
+    """
+    Affiche et centre le logo (images/logo.webp) ;
+    lorsqu’on clique dessus, on revient à la home page ("/").
+    """
+    # 1) Image pré-encodée à la bonne largeur (une fois par process)
+    src = _logo_src(width, os.stat(LOGO_PATH).st_mtime_ns)
 
     # 2) Génère le HTML centré + lien vers "/"
     html = f"""
     <div style="text-align:center; margin-bottom:1rem;">
       <a href="/">
-        <img src="data:image/webp;base64,{b64}" width="{width}" />
+        <img src="{src}" width="{width}" />
       </a>
     </div>
     """
@@ -1,10 +1,10 @@
 # visuals.py
 
-import plotly.io as pio
-import plotly.graph_objects as go
+TEMPLATE_NAME = "finance_gb_blend"
 
-# 1) Définition du layout “green‑blue blend”
-finance_layout = go.Layout(
+# 1) Définition du layout “green‑blue blend” (dictionnaires simples : la
+#    validation Plotly n'a lieu qu'à l'enregistrement du template)
+finance_layout = dict(
     font=dict(
         family="Helvetica, Arial, sans-serif",
         size=12,
@@ -51,21 +51,31 @@ finance_layout = go.Layout(
     margin=dict(l=60, r=60, t=80, b=60)
 )
 
-# 2) Enregistrement du template et ajout des defaults Waterfall
-finance_template = go.layout.Template(
-    layout=finance_layout,
-    data={
-        "waterfall": [
-            go.Waterfall(
-                # Couleur des impacts positifs
-                increasing=dict(marker=dict(color="#2171B5")),
-                # Couleur des impacts négatifs
-                decreasing=dict(marker=dict(color="#238B45")),
-                connector=dict(line=dict(color="#E1E1E1"))
-            )
-        ]
-    }
-)
+# 2) Defaults Waterfall
+finance_data = {
+    "waterfall": [
+        dict(
+            # Couleur des impacts positifs
+            increasing=dict(marker=dict(color="#2171B5")),
+            # Couleur des impacts négatifs
+            decreasing=dict(marker=dict(color="#238B45")),
+            connector=dict(line=dict(color="#E1E1E1"))
+        )
+    ]
+}
+
+
+def register():
+    """
+    Enregistre le template et en fait le défaut Plotly. Idempotent : le
+    template n'est construit qu'au premier appel du process, les appels
+    suivants ne coûtent qu'un test d'appartenance. Appelé par
+    figcache.cached_figure avant chaque construction de figure.
+    """
+    import plotly.io as pio
 
-pio.templates["finance_gb_blend"] = finance_template
-pio.templates.default = "finance_gb_blend"
+    if TEMPLATE_NAME not in pio.templates:
+        import plotly.graph_objects as go
+        pio.templates[TEMPLATE_NAME] = go.layout.Template(layout=finance_layout, data=finance_data)
+    if pio.templates.default != TEMPLATE_NAME:
+        pio.templates.default = TEMPLATE_NAME
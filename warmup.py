@@ -0,0 +1,243 @@
+# warmup.py
+
+import argparse
+import glob
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Fichier de disponibilité écrit une fois les caches chauds (vide = désactivé)
+READY_FILE = os.environ.get("FPNA_READY_FILE", "")
+# Port du point de santé HTTP (0 = désactivé)
+HEALTH_PORT = int(os.environ.get("FPNA_HEALTH_PORT", "0"))
+# Threads du pool de préchauffage
+MAX_WORKERS = int(os.environ.get("FPNA_WARMUP_WORKERS", "4"))
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN_SCRIPT = "Home.py"
+
+
+def _sqlite():
+    import datastore
+    import sqlite_store
+    if datastore.SQL_BACKEND == "sqlite":
+        sqlite_store.build_database()
+        sqlite_store.get_pool(datastore.load_dataset().version)
+
+
+def _cube():
+    from cube import load_cube
+    load_cube()
+
+
+def _engine():
+    from scenario import load_engine
+    load_engine("Forecast")
+
+
+def _statistical():
+    from scenario import load_engine
+    load_engine("Statistical")
+
+
+def _optimizer():
+    from optimizer import load_model
+    load_model()
+
+
+# Structures dérivées, indépendantes entre elles une fois le Dataset chargé
+STAGES = {
+    "sqlite": _sqlite,
+    "cube": _cube,
+    "engine": _engine,
+    "statistical": _statistical,
+    "optimizer": _optimizer,
+}
+
+
+class Readiness:
+    """
+    État du préchauffage, lu par le point de santé et écrit dans le fichier
+    de disponibilité : "warming", puis "degraded" (étape en échec) ou
+    "ready". Avec un serveur à attendre, l'état intermédiaire "starting"
+    (caches chauds, port pas encore ouvert) précède "ready".
+    """
+
+    def __init__(self, ready_file: str = READY_FILE):
+        self.ready_file = ready_file
+        if ready_file and os.path.exists(ready_file):
+            os.remove(ready_file)  # pas de fichier périmé d'un démarrage précédent
+        self.status = "warming"
+        self.stages = {}   # étape -> secondes (ou message d'erreur)
+        self.version = None
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, result):
+        with self._lock:
+            self.stages[stage] = result
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"status": self.status, "pid": os.getpid(), "stages": dict(self.stages)}
+
+    def finish(self, version: str, serving: bool = False):
+        """Fin du préchauffage ; avec `serving`, "ready" attend listening()."""
+        with self._lock:
+            failed = any(isinstance(v, str) for v in self.stages.values())
+            self.status = "degraded" if failed else ("starting" if serving else "ready")
+            self.version = version
+        if not serving:
+            self._write()
+
+    def listening(self):
+        """Le serveur Streamlit accepte les connexions : l'instance peut recevoir du trafic."""
+        with self._lock:
+            if self.status == "starting":
+                self.status = "ready"
+        self._write()
+
+    def _write(self):
+        if self.ready_file:
+            tmp_path = f"{self.ready_file}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(dict(self.snapshot(), version=self.version), f, indent=2)
+            os.replace(tmp_path, self.ready_file)
+
+
+def serve_health(readiness: Readiness, port: int) -> ThreadingHTTPServer:
+    """
+    Point de santé HTTP (thread démon) : 200 seulement à l'état "ready"
+    (caches chauds et, avec --serve, port Streamlit ouvert) ; 503 sinon,
+    y compris pour un préchauffage "degraded". Corps JSON avec le détail
+    des étapes.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(readiness.snapshot()).encode()
+            self.send_response(200 if readiness.status == "ready" else 503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def wait_listening(readiness: Readiness, port: int, host: str = "127.0.0.1", interval: float = 0.2):
+    """
+    Thread démon : attend que `port` accepte les connexions (serveur
+    Streamlit démarré par bootstrap.run), puis appelle readiness.listening().
+    """
+    def poll():
+        while True:
+            try:
+                with socket.create_connection((host, port), timeout=1):
+                    break
+            except OSError:
+                time.sleep(interval)
+        readiness.listening()
+
+    threading.Thread(target=poll, daemon=True).start()
+
+
+def _timed(readiness: Readiness, stage: str, func):
+    t0 = time.perf_counter()
+    try:
+        func()
+        readiness.record(stage, round(time.perf_counter() - t0, 3))
+    except Exception as exc:  # une étape en échec ne bloque pas les autres
+        readiness.record(stage, f"{type(exc).__name__}: {exc}")
+
+
+def warm_pages(readiness: Readiness, pages=None):
+    """
+    Exécute chaque page une fois avec ses filtres par défaut (AppTest) :
+    remplit le cache de figures et les caches propres aux pages. Les pages
+    tournent l'une après l'autre (le runner de scripts n'est pas prévu pour
+    des exécutions concurrentes).
+    """
+    from streamlit.testing.v1 import AppTest
+
+    for path in pages or [MAIN_SCRIPT] + sorted(glob.glob("pages/*.py")):
+        def run(path=path):
+            at = AppTest.from_file(os.path.abspath(path), default_timeout=600).run()
+            if at.exception:
+                raise RuntimeError(at.exception[0].message)
+        _timed(readiness, f"page:{path}", run)
+
+
+def warm_up(readiness: Readiness, workers: int = MAX_WORKERS, pages: bool = True,
+            serving: bool = False):
+    """
+    Préchauffe les caches du process : Dataset (et caches disque Arrow IPC),
+    puis les structures dérivées en parallèle dans un pool de threads, puis
+    les figures par défaut de chaque page. Avec `serving`, l'état "ready"
+    attend l'ouverture du port (Readiness.listening).
+    """
+    from datastore import load_dataset
+
+    _timed(readiness, "dataset", load_dataset)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for stage, func in STAGES.items():
+            pool.submit(_timed, readiness, stage, func)
+    if pages:
+        warm_pages(readiness)
+    readiness.finish(load_dataset().version, serving=serving)
+    return readiness
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Préchauffe les caches de l'application avant d'accepter du trafic."
+    )
+    parser.add_argument("--serve", action="store_true",
+                        help="démarre ensuite Streamlit dans le même process (caches mémoire conservés)")
+    parser.add_argument("--port", type=int, default=None, help="port du serveur Streamlit (--serve)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="threads de préchauffage")
+    parser.add_argument("--no-pages", action="store_true",
+                        help="ne pas exécuter les pages (toujours le cas sans --serve)")
+    parser.add_argument("--ready-file", default=READY_FILE, help="fichier JSON écrit une fois prêt")
+    parser.add_argument("--health-port", type=int, default=HEALTH_PORT,
+                        help="port du point de santé HTTP (200 une fois prêt, 503 sinon)")
+    args = parser.parse_args(argv)
+
+    os.chdir(APP_DIR)
+    sys.path.insert(0, APP_DIR)
+    flag_options = {"server.port": args.port} if args.port else {}
+    if args.serve:
+        # Configuration du serveur chargée avant le préchauffage (static serving…)
+        from streamlit.web import bootstrap
+        bootstrap.load_config_options(flag_options=flag_options)
+
+    readiness = Readiness(args.ready_file)
+    if args.health_port:
+        serve_health(readiness, args.health_port)
+
+    # Sans --serve, le process s'arrête après le préchauffage : les caches
+    # mémoire remplis par les pages seraient perdus, seuls les caches disque comptent
+    t0 = time.perf_counter()
+    warm_up(readiness, workers=args.workers, pages=args.serve and not args.no_pages,
+            serving=args.serve)
+    report = readiness.snapshot()
+    print(json.dumps(dict(report, seconds=round(time.perf_counter() - t0, 3)), indent=2))
+
+    if args.serve:
+        from streamlit import config
+        wait_listening(readiness, config.get_option("server.port"),
+                       config.get_option("server.address") or "127.0.0.1")
+        bootstrap.run(MAIN_SCRIPT, False, [], flag_options)
+    return 0 if report["status"] in ("ready", "starting") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())